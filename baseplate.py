@@ -1,9 +1,12 @@
+from buffer import PlacementBuffer
+from placement import IDENTITY
+
 PLATE_32x32 = "3811.dat"
 
 
 def build_baseplate_grid(ctx, cols, rows, color=1, origin_x_stud=0, origin_z_stud=0):
 
-    lines = []
+    placements = PlacementBuffer()
 
     for r in range(rows):
         for c in range(cols):
@@ -12,6 +15,6 @@ def build_baseplate_grid(ctx, cols, rows, color=1, origin_x_stud=0, origin_z_stu
             y = ctx.baseplate_origin_y
             z = ctx.studs(origin_z_stud + r * 32)
 
-            lines.append(f"1 {color} {x} {y} {z} 1 0 0 0 1 0 0 0 1 {PLATE_32x32}")
+            placements.add(color, x, y, z, IDENTITY, PLATE_32x32)
 
-    return lines
+    return ctx.apply(placements)
@@ -0,0 +1,167 @@
+"""block_cache.py
+
+Content-addressed on-disk cache of rendered scene blocks.
+
+Each cached block (one group, one text block, ...) is stored under the
+SHA-256 of everything it is built from:
+
+  - the block's own parameters (label, position, seats, color, ...)
+  - the scene context (ground plane, current transform)
+  - the template (its serialized content)
+  - the source files of the modules that render blocks (`code_fingerprint`)
+
+so any change in inputs or code gives a new key, and an unchanged block is
+read back instead of rebuilt. Entries hold the placements
+(`PlacementBuffer.to_bytes`) and their formatted LDraw text, so a cache hit
+skips both building and formatting: blocks come back as
+`export.RenderedBlock` and are written verbatim.
+
+Entries are never invalidated in place; stale files can be deleted at any
+time (e.g. `rm -r build/cache/blocks`).
+"""
+
+import hashlib
+import json
+import os
+import struct
+import zlib
+from pathlib import Path
+
+from buffer import PlacementBuffer
+from export import RenderedBlock
+
+# Entry layout: magic, length of the serialized buffer, length of the text,
+# CRC-32 of both; then buffer, then text
+_ENTRY_HEADER = struct.Struct("<4sQQI")
+_ENTRY_MAGIC = b"BLK1"
+
+# Modules whose code decides what a block looks like (flat modules next to
+# this file; "main" holds the group and text builders)
+RENDER_MODULES = (
+    "baseplate",
+    "buffer",
+    "catalog",
+    "context",
+    "digits",
+    "export",
+    "main",
+    "minifig",
+    "placement",
+    "plate",
+    "raster",
+    "text",
+    "tiling",
+)
+
+
+_SOURCE_DIR = Path(__file__).resolve().parent
+
+
+def code_fingerprint(modules=RENDER_MODULES):
+    """
+    SHA-256 of the source files of `modules`.
+
+    Sources are read by file path rather than through `sys.modules`: run as
+    a script, main.py is imported as "__main__" and would be left out.
+    """
+
+    digest = hashlib.sha256()
+
+    for name in modules:
+        digest.update(name.encode("utf-8"))
+        digest.update((_SOURCE_DIR / f"{name}.py").read_bytes())
+
+    return digest.hexdigest()
+
+
+class BlockCache:
+    """
+    Usage:
+
+        cache = BlockCache(build_dir / "cache" / "blocks")
+        block = cache.get_or_build(("group", label, x, z), build)
+
+    `build` returns a PlacementBuffer and is only called on a miss; blocks
+    are returned as RenderedBlock. `hits` / `misses` count lookups.
+    """
+
+    def __init__(self, directory, fingerprint=None):
+        self.directory = Path(directory)
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, parts):
+        """Cache key of a block described by the JSON-serializable `parts`."""
+
+        if self.fingerprint is None:
+            self.fingerprint = code_fingerprint()
+
+        text = json.dumps([self.fingerprint, parts], separators=(",", ":"))
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.bin"
+
+    def get(self, key):
+        """Cached block for `key`; None if missing, truncated or unreadable."""
+
+        try:
+            data = self._path(key).read_bytes()
+        except OSError:
+            return None
+
+        if len(data) < _ENTRY_HEADER.size:
+            return None
+
+        magic, size, text_size, crc = _ENTRY_HEADER.unpack_from(data)
+        payload = memoryview(data)[_ENTRY_HEADER.size :]
+        if (
+            magic != _ENTRY_MAGIC
+            or len(payload) != size + text_size
+            or zlib.crc32(payload) != crc
+        ):
+            return None
+
+        try:
+            buffer = PlacementBuffer.from_bytes(payload[:size])
+            return RenderedBlock(buffer, bytes(payload[size:]).decode("utf-8"))
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def put(self, key, block):
+        """Store a RenderedBlock."""
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        serialized = block.buffer.to_bytes()
+        text = block.text.encode("utf-8")
+        crc = zlib.crc32(text, zlib.crc32(serialized))
+        data = b"".join(
+            (
+                _ENTRY_HEADER.pack(_ENTRY_MAGIC, len(serialized), len(text), crc),
+                serialized,
+                text,
+            )
+        )
+
+        # Atomic: concurrent builds never read a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def get_or_build(self, parts, build):
+        """Return the cached block for `parts`, building (and storing) it on a miss."""
+
+        key = self.key(parts)
+        block = self.get(key)
+
+        if block is not None:
+            self.hits += 1
+            return block
+
+        self.misses += 1
+        block = RenderedBlock.render(build())
+        self.put(key, block)
+        return block
@@ -1,174 +1,286 @@
-from collections import defaultdict
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
 
-from brick import BRICKS, get_brick_size
-from plate import get_plate_size, PLATES
-from tile import get_tile_size, TILES
+from buffer import PlacementBuffer
+from catalog import PART_CATALOG
+from colors import MAIN_COLOR, color_name
+from placement import Comment
 
 # ============================================================
 # CLASSIFICATION
 # ============================================================
 
+# Printed heads (3626bp01, 3626cp01, ...) all classify as MINIFIG_HEAD
+MINIFIG_HEAD_PREFIX = "3626"
 
-def classify_part(part_id):
+
+@lru_cache(maxsize=None)
+def part_info(part_id):
     """
-    Strict classification of all parts used in this project.
+    Strict lookup of (category, width, length) for all parts used in this
+    project (see catalog.PART_CATALOG).
     No fallback allowed.
     """
 
     part = part_id.replace(".dat", "")
 
-    # ==================================================
-    # BASEPLATE
-    # ==================================================
-    if part == "3811":
-        return "PLATE_32x32"
+    if part.startswith(MINIFIG_HEAD_PREFIX):
+        return ("MINIFIG_HEAD", None, None)
+
+    info = PART_CATALOG.get(part)
 
     # ==================================================
-    # MINIFIG CORE PARTS
+    # STRICT MODE
     # ==================================================
-    if part.startswith("3626"):
-        return "MINIFIG_HEAD"
+    if info is None:
+        raise ValueError(f"Unknown part detected in BOM: {part_id}")
 
-    if part == "973":
-        return "MINIFIG_TORSO"
+    return info
 
-    if part in {"3818", "3819"}:
-        return "MINIFIG_ARMS"
 
-    if part == "3820":
-        return "MINIFIG_HANDS"
+def classify_part(part_id):
+    """
+    Strict classification of all parts used in this project.
+    No fallback allowed.
+    """
 
-    if part in {"3815", "3816", "3817", "87609"}:
-        return "MINIFIG_LEGS"
+    return part_info(part_id)[0]
 
-    # ==================================================
-    # MINIFIG ACCESSORIES
-    # ==================================================
-    if part in {
-        "88646",  # neck bracket
-        "30414",  # armor
-    }:
-        return "MINIFIG_ACCESSORY"
 
-    # ==================================================
-    # BRICKS
-    # ==================================================
-    for width_dict in BRICKS.values():
-        for ref in width_dict.values():
-            if part == ref.replace(".dat", ""):
-                return "BRICKS"
+def _resolve_color(color, parent_color):
+    """Color 16 ("main color") takes the color of the referencing line."""
 
-    # ==================================================
-    # TILES
-    # ==================================================
-    for width_dict in TILES.values():
-        for ref in width_dict.values():
-            if part == ref.replace(".dat", ""):
-                return "TILES"
+    return parent_color if color == MAIN_COLOR else color
 
-    # ==================================================
-    # STANDARD PLATES
-    # ==================================================
-    if part == "3024":
-        return "PLATE_1x1"
 
-    for width_dict in PLATES.values():
-        for ref in width_dict.values():
-            if part == ref.replace(".dat", ""):
-                return "PLATES"
+class BomAccumulator:
+    """
+    Incremental BOM, fed block by block (e.g. while streaming to disk).
 
-    # ==================================================
-    # MODIFIED PLATES
-    # ==================================================
-    if part in {"2431"}:
-        return "PLATES_MODIFIED"
+    Counts are keyed by (part_id, color). The current section carries over
+    from one block to the next.
 
-    # ==================================================
-    # STRICT MODE
-    # ==================================================
-    raise ValueError(f"Unknown part detected in BOM: {part_id}")
+    `submodels` maps submodel names (MPD "0 FILE" names) to their content.
+    A reference counts as the submodel's parts times the instance count;
+    parts in color 16 inside a submodel take the reference's color.
+    Each submodel's BOM is computed once and memoized, so counting costs
+    O(unique submodels), not O(total parts).
+    """
+
+    def __init__(self, submodels=None):
+        self.bom = defaultdict(lambda: defaultdict(int))
+        self.section = "UNDEFINED"
+        self.submodels = submodels or {}
+        self._submodel_boms = {}
+
+    def add(self, items):
+        """Count a PlacementBuffer or an iterable of Placement/Comment records."""
+
+        if isinstance(items, PlacementBuffer):
+            # Columnar fast path: count interned (part, color) pairs per section
+            for section, start, stop in items.sections(self.section):
+                self.section = section
+                counts = Counter(
+                    zip(items.part_index[start:stop], items.colors[start:stop])
+                )
+                for (index, color), count in counts.items():
+                    self._count(section, items.part_ids[index], color, count)
+            return
+
+        for item in items:
+
+            if isinstance(item, Comment):
+                if item.section is not None:
+                    self.section = item.section
+                continue
+
+            self._count(self.section, item.part_id, item.color, 1)
+
+    def _count(self, section, part_id, color, count):
+        if part_id not in self.submodels:
+            self.bom[section][(part_id, color)] += count
+            return
+
+        # Instance: count the submodel's parts `count` times
+        for (sub_part, sub_color), sub_count in self.submodel_bom(part_id).items():
+            key = (sub_part, _resolve_color(sub_color, color))
+            self.bom[section][key] += sub_count * count
+
+    def submodel_bom(self, name, _stack=()):
+        """
+        Return the flattened {(part_id, color): count} of one submodel instance.
+
+        Nested references are multiplied out; color 16 is kept as-is until
+        the instance color is known. Results are memoized.
+        """
+
+        cached = self._submodel_boms.get(name)
+        if cached is not None:
+            return cached
+
+        if name in _stack:
+            raise ValueError(f"Recursive submodel reference: {name}")
+
+        submodel = self.submodels[name]
+        flat = Counter()
+
+        for (index, color), count in Counter(
+            zip(submodel.part_index, submodel.colors)
+        ).items():
+            part_id = submodel.part_ids[index]
+            if part_id in self.submodels:
+                for (sub_part, sub_color), sub_count in self.submodel_bom(
+                    part_id, _stack + (name,)
+                ).items():
+                    key = (sub_part, _resolve_color(sub_color, color))
+                    flat[key] += sub_count * count
+            else:
+                flat[(part_id, color)] += count
 
+        self._submodel_boms[name] = flat
+        return flat
 
-def generate_bom_from_lines(lines):
+
+def generate_bom(items, submodels=None):
     """
     Generate BOM grouped by section markers.
 
+    Reads scene records (Placement / Comment) directly and returns
+    {section: {(part_id, color): count}}.
     Sections are defined by:
         0 ===== SECTION NAME =====
+
+    References to `submodels` ({name: PlacementBuffer}) are expanded.
     """
 
-    bom = defaultdict(lambda: defaultdict(int))
-    current_section = "UNDEFINED"
+    accumulator = BomAccumulator(submodels)
+    accumulator.add(items)
+    return accumulator.bom
 
-    for line in lines:
 
-        line = line.strip()
+# ============================================================
+# AGGREGATION
+# ============================================================
 
-        if line.startswith("0 ====="):
-            current_section = line.replace("0 =====", "").replace("=====", "").strip()
-            continue
 
-        if not line.startswith("1 "):
-            continue
+@dataclass
+class BomSummary:
+    """Category, size and color breakdown of one BOM section (or the whole BOM).
 
-        parts = line.split()
-        part_id = parts[-1]
+    `parts` is keyed by (part_id, color), `color_totals` by LDraw color code.
+    """
 
-        bom[current_section][part_id] += 1
+    parts: dict = field(default_factory=lambda: defaultdict(int))
+    color_totals: dict = field(default_factory=lambda: defaultdict(int))
+    category_totals: dict = field(default_factory=lambda: defaultdict(int))
+    plate_details: dict = field(default_factory=lambda: defaultdict(int))
+    brick_details: dict = field(default_factory=lambda: defaultdict(int))
+    tile_details: dict = field(default_factory=lambda: defaultdict(int))
+    total: int = 0
 
-    return bom
+    def add_part(self, part_id, color, count):
+        """Classify and count `count` copies of one part in one color."""
 
+        category, width, length = part_info(part_id)
+        size = (width, length) if width else None
 
-# ============================================================
-# PRINT BOM PER SECTION
-# ============================================================
+        self.parts[(part_id, color)] += count
+        self.color_totals[color] += count
+
+        if category == "PLATES":
+            if size:
+                self.plate_details[size] += count
+            self.category_totals["PLATES"] += count
 
+        elif category == "BRICKS":
+            if size:
+                self.brick_details[size] += count
+            self.category_totals["BRICKS"] += count
 
-def print_bom(bom):
+        elif category == "TILES":
+            if size:
+                self.tile_details[size] += count
+            self.category_totals["TILES"] += count
+
+        else:
+            self.category_totals[category] += count
+
+        self.total += count
+
+    def merge(self, other):
+        """Add another summary into this one (no re-classification)."""
+
+        for target, source in (
+            (self.parts, other.parts),
+            (self.color_totals, other.color_totals),
+            (self.category_totals, other.category_totals),
+            (self.plate_details, other.plate_details),
+            (self.brick_details, other.brick_details),
+            (self.tile_details, other.tile_details),
+        ):
+            for key, count in source.items():
+                target[key] += count
+
+        self.total += other.total
+
+
+@dataclass
+class BomReport:
     """
-    Print BOM grouped by section.
-    Plates and bricks are detailed by size.
+    BOM aggregated once: per-section summaries and the global summary.
+
+    Printers and exporters read from this object instead of re-classifying
+    parts.
     """
 
-    print("\n===== BILL OF MATERIALS =====\n")
+    sections: dict
+    global_summary: BomSummary
+
+
+def build_bom_report(bom):
+    """Aggregate a {section: {(part_id, color): count}} BOM into a BomReport."""
+
+    if isinstance(bom, BomReport):
+        return bom
+
+    sections = {}
+    global_summary = BomSummary()
 
     for section, parts in bom.items():
 
-        print(f"--- {section} ---")
+        summary = BomSummary()
+        for (part_id, color), count in parts.items():
+            summary.add_part(part_id, color, count)
+
+        sections[section] = summary
+        global_summary.merge(summary)
 
-        category_totals = defaultdict(int)
-        plate_details = defaultdict(int)
-        brick_details = defaultdict(int)
-        tile_details = defaultdict(int)
+    return BomReport(sections, global_summary)
 
-        total = 0
 
-        for part_id, count in parts.items():
+# ============================================================
+# PRINT BOM PER SECTION
+# ============================================================
+
+
+def print_bom(bom):
+    """
+    Print BOM grouped by section.
+    Plates and bricks are detailed by size.
 
-            category = classify_part(part_id)
+    Accepts a BomReport or a raw {section: {(part_id, color): count}} BOM.
+    """
 
-            if category == "PLATES":
-                size = get_plate_size(part_id)
-                if size:
-                    plate_details[size] += count
-                category_totals["PLATES"] += count
+    report = build_bom_report(bom)
 
-            elif category == "BRICKS":
-                size = get_brick_size(part_id)
-                if size:
-                    brick_details[size] += count
-                category_totals["BRICKS"] += count
+    print("\n===== BILL OF MATERIALS =====\n")
 
-            elif category == "TILES":
-                size = get_tile_size(part_id)
-                if size:
-                    tile_details[size] += count
-                category_totals["TILES"] += count
+    for section, summary in report.sections.items():
 
-            else:
-                category_totals[category] += count
+        print(f"--- {section} ---")
 
-            total += count
+        category_totals = summary.category_totals
 
         # --- Non plate/brick categories ---
         for category in sorted(category_totals.keys()):
@@ -177,23 +289,23 @@ def print_bom(bom):
             print(f"{category:20} x {category_totals[category]}")
 
         # --- Plates detail ---
-        if plate_details:
+        if summary.plate_details:
             print("PLATES:")
-            for w, l in sorted(plate_details.keys()):
-                print(f"  {w}x{l:<3} x {plate_details[(w, l)]}")
+            for w, l in sorted(summary.plate_details.keys()):
+                print(f"  {w}x{l:<3} x {summary.plate_details[(w, l)]}")
 
         # --- Bricks detail ---
-        if brick_details:
+        if summary.brick_details:
             print("BRICKS:")
-            for w, l in sorted(brick_details.keys()):
-                print(f"  {w}x{l:<3} x {brick_details[(w, l)]}")
+            for w, l in sorted(summary.brick_details.keys()):
+                print(f"  {w}x{l:<3} x {summary.brick_details[(w, l)]}")
 
-        if tile_details:
+        if summary.tile_details:
             print("TILES:")
-            for w, l in sorted(tile_details.keys()):
-                print(f"  {w}x{l:<3} x {tile_details[(w, l)]}")
+            for w, l in sorted(summary.tile_details.keys()):
+                print(f"  {w}x{l:<3} x {summary.tile_details[(w, l)]}")
 
-        print(f"Total {section}: {total}\n")
+        print(f"Total {section}: {summary.total}\n")
 
 
 # ============================================================
@@ -204,47 +316,16 @@ def print_bom(bom):
 def print_global_summary(bom):
     """
     Print consolidated global summary.
-    Plates and bricks are detailed by size.
-    """
+    Plates and bricks are detailed by size, and totals are given per color.
 
-    global_counts = defaultdict(int)
+    Accepts a BomReport or a raw {section: {(part_id, color): count}} BOM.
+    """
 
-    # Merge all sections
-    for section_parts in bom.values():
-        for part_id, count in section_parts.items():
-            global_counts[part_id] += count
+    summary = build_bom_report(bom).global_summary
 
     print("\n===== GLOBAL SUMMARY =====\n")
 
-    category_totals = defaultdict(int)
-    plate_details = defaultdict(int)
-    brick_details = defaultdict(int)
-    tile_details = defaultdict(int)
-
-    for part_id, count in global_counts.items():
-
-        category = classify_part(part_id)
-
-        if category == "PLATES":
-            size = get_plate_size(part_id)
-            if size:
-                plate_details[size] += count
-            category_totals["PLATES"] += count
-
-        elif category == "BRICKS":
-            size = get_brick_size(part_id)
-            if size:
-                brick_details[size] += count
-            category_totals["BRICKS"] += count
-
-        elif category == "TILES":
-            size = get_tile_size(part_id)
-            if size:
-                tile_details[size] += count
-            category_totals["TILES"] += count
-
-        else:
-            category_totals[category] += count
+    category_totals = summary.category_totals
 
     total_all = 0
 
@@ -256,19 +337,26 @@ def print_global_summary(bom):
         total_all += category_totals[category]
 
     # --- Plates detail ---
-    if plate_details:
+    if summary.plate_details:
         print("\nPLATES:")
-        for w, l in sorted(plate_details.keys()):
-            count = plate_details[(w, l)]
+        for w, l in sorted(summary.plate_details.keys()):
+            count = summary.plate_details[(w, l)]
             print(f"  {w}x{l:<3} x {count}")
             total_all += count
 
     # --- Bricks detail ---
-    if brick_details:
+    if summary.brick_details:
         print("\nBRICKS:")
-        for w, l in sorted(brick_details.keys()):
-            count = brick_details[(w, l)]
+        for w, l in sorted(summary.brick_details.keys()):
+            count = summary.brick_details[(w, l)]
             print(f"  {w}x{l:<3} x {count}")
             total_all += count
 
+    # --- Colors ---
+    if summary.color_totals:
+        print("\nCOLORS:")
+        for color in sorted(summary.color_totals.keys()):
+            name = f"{color_name(color)} ({color})"
+            print(f"  {name:24} x {summary.color_totals[color]}")
+
     print(f"\nTOTAL PIECES: {total_all}\n")
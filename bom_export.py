@@ -0,0 +1,240 @@
+"""bom_export.py
+
+Machine-readable BOM export: CSV, JSON and BrickLink wanted-list XML.
+
+Every writer consumes the BOM one section at a time and writes it out
+immediately, so a generator of sections can be exported without building
+the full report in memory. Accepted inputs:
+
+  - a BomReport (see bom.build_bom_report)
+  - a raw {section: {(part_id, color): count}} BOM
+  - any iterable of (section, {(part_id, color): count}) pairs
+
+Colors are LDraw color codes; names and BrickLink ids come from colors.py.
+Part ids are translated to BrickLink item ids through BRICKLINK_ITEM_IDS;
+parts missing from it are left out of the wanted list and flagged.
+"""
+
+import csv
+import json
+from collections import defaultdict
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from bom import BomReport, part_info
+from catalog import BRICKS, PLATES, TILES
+from colors import bricklink_color_id, color_name
+
+CSV_HEADER = (
+    "section",
+    "part_id",
+    "color",
+    "color_name",
+    "category",
+    "width",
+    "length",
+    "quantity",
+)
+
+
+def _iter_sections(bom):
+    if isinstance(bom, BomReport):
+        return (
+            (section, summary.parts) for section, summary in bom.sections.items()
+        )
+    if isinstance(bom, dict):
+        return iter(bom.items())
+    return iter(bom)
+
+
+def _part_rows(parts):
+    """
+    Yield (part_id, color, color_name, category, width, length, quantity),
+    sorted by part id then color.
+    """
+
+    for part_id, color in sorted(parts):
+        category, width, length = part_info(part_id)
+        if width is None:
+            width, length = "", ""
+        quantity = parts[(part_id, color)]
+        yield part_id, color, color_name(color), category, width, length, quantity
+
+
+def _same_ids(*catalogs):
+    return {
+        ref.replace(".dat", ""): ref.replace(".dat", "")
+        for catalog in catalogs
+        for length_dict in catalog.values()
+        for ref in length_dict.values()
+    }
+
+
+# LDraw part (without ".dat") -> BrickLink item id.
+# Plain plates, bricks and tiles share their number; minifig parts and
+# suffixed / printed variants do not, so every id is listed explicitly.
+BRICKLINK_ITEM_IDS = {
+    **_same_ids(PLATES, BRICKS, TILES),
+    "2431": "2431",  # tile 1x4 with groove
+    "2431b": "2431",
+    "3811": "3811",  # baseplate 32x32
+    "30414": "30414",
+    "87609": "87609",
+    "88646": "88646",
+    # Minifig parts: LDraw splits figures differently from BrickLink
+    "973": "973",  # torso
+    "3815": "970",  # hips
+    "3816": "972",  # right leg
+    "3817": "971",  # left leg
+    "3818": "981",  # right arm
+    "3819": "982",  # left arm
+    "3820": "983",  # hand
+    # Printed heads (e.g. 3626cp01) have no fixed BrickLink counterpart and
+    # stay unmapped until added here.
+}
+
+
+def bricklink_item_id(part_id):
+    """
+    BrickLink item id of an LDraw part (file name with or without ".dat"),
+    or None if it is not in BRICKLINK_ITEM_IDS.
+    """
+
+    return BRICKLINK_ITEM_IDS.get(part_id.replace(".dat", ""))
+
+
+# ============================================================
+# CSV
+# ============================================================
+
+
+def write_bom_csv(path, bom):
+    """Write one row per (section, part)."""
+
+    with Path(path).open("w", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(CSV_HEADER)
+
+        for section, parts in _iter_sections(bom):
+            for row in _part_rows(parts):
+                writer.writerow((section,) + row)
+
+
+# ============================================================
+# JSON
+# ============================================================
+
+
+def write_bom_json(path, bom):
+    """
+    Write {"sections": [...], "total": [...], "colors": [...]}.
+
+    Sections are serialized one by one as they arrive; only the global
+    per-(part, color) totals are kept until the end.
+    """
+
+    totals = defaultdict(int)
+
+    with Path(path).open("w", encoding="utf-8") as handle:
+        handle.write('{\n  "sections": [')
+
+        for i, (section, parts) in enumerate(_iter_sections(bom)):
+            entry = {
+                "section": section,
+                "parts": [_json_row(row) for row in _part_rows(parts)],
+            }
+            handle.write("," if i else "")
+            handle.write("\n    " + json.dumps(entry))
+
+            for part_id, count in parts.items():
+                totals[part_id] += count
+
+        color_totals = defaultdict(int)
+        for (_, color), count in totals.items():
+            color_totals[color] += count
+
+        handle.write('\n  ],\n  "total": ')
+        handle.write(json.dumps([_json_row(row) for row in _part_rows(totals)]))
+        handle.write(',\n  "colors": ')
+        handle.write(
+            json.dumps(
+                [
+                    {"color": color, "color_name": color_name(color), "quantity": count}
+                    for color, count in sorted(color_totals.items())
+                ]
+            )
+        )
+        handle.write("\n}\n")
+
+
+def _json_row(row):
+    part_id, color, name, category, width, length, quantity = row
+    return {
+        "part_id": part_id,
+        "color": color,
+        "color_name": name,
+        "category": category,
+        "width": width or None,
+        "length": length or None,
+        "quantity": quantity,
+    }
+
+
+# ============================================================
+# BRICKLINK WANTED LIST
+# ============================================================
+
+
+def write_bricklink_xml(path, bom):
+    """
+    Write a BrickLink wanted-list XML (one ITEM per part and color).
+
+    Only per-(item, color) totals are kept in memory while sections are
+    consumed. Colors without a known BrickLink id are left unspecified.
+    Parts without a BrickLink item id (see `bricklink_item_id`) are not
+    written as items: they are listed in a comment at the end of the file.
+
+    Returns
+    -------
+    list of str
+        The unmapped LDraw part ids (without ".dat"), sorted.
+    """
+
+    totals = defaultdict(int)
+    unmapped = defaultdict(int)
+
+    for _, parts in _iter_sections(bom):
+        for (part_id, color), count in parts.items():
+            item_id = bricklink_item_id(part_id)
+            if item_id is None:
+                unmapped[(part_id.replace(".dat", ""), color)] += count
+                continue
+            totals[(item_id, bricklink_color_id(color))] += count
+
+    with Path(path).open("w", encoding="utf-8") as handle:
+        handle.write("<INVENTORY>\n")
+
+        for item_id, color_id in sorted(totals, key=lambda k: (k[0], k[1] or 0)):
+            color = "" if color_id is None else f"    <COLOR>{color_id}</COLOR>\n"
+            handle.write(
+                "  <ITEM>\n"
+                "    <ITEMTYPE>P</ITEMTYPE>\n"
+                f"    <ITEMID>{escape(item_id)}</ITEMID>\n"
+                f"{color}"
+                f"    <MINQTY>{totals[(item_id, color_id)]}</MINQTY>\n"
+                "  </ITEM>\n"
+            )
+
+        if unmapped:
+            handle.write("  <!-- UNMAPPED: no BrickLink item id, not listed\n")
+            for part_id, color in sorted(unmapped):
+                # "--" may not appear inside an XML comment
+                name = escape(part_id).replace("--", "- -")
+                handle.write(
+                    f"       {name} color {color} x {unmapped[(part_id, color)]}\n"
+                )
+            handle.write("  -->\n")
+
+        handle.write("</INVENTORY>\n")
+
+    return sorted({part_id for part_id, _ in unmapped})
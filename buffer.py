@@ -0,0 +1,441 @@
+"""buffer.py
+
+Columnar placement store.
+
+A `PlacementBuffer` keeps placements in flat typed arrays instead of one
+Python object per part:
+
+    colors         array('i')   one LDraw color per placement
+    positions      array('d')   x, y, z per placement (LDU)
+    matrix_index   array('I')   index into `matrices` (interned 3x3 tuples)
+    part_index     array('I')   index into `part_ids` (interned part ids)
+
+Orientation matrices and part ids are interned: a scene with millions of 1x1
+plates stores the identity matrix and "3024.dat" once.
+
+Columns stay stdlib `array.array` objects (cheap appends, plain buffers);
+bulk operations (translating, transforming, validating) view them as NumPy
+arrays without copying. NumPy is a required dependency (requirements.txt).
+
+Meta lines (type-0) are few, so they are kept as (position, text) pairs where
+position is the number of placements emitted before the comment.
+
+Iterating a buffer yields `Placement` / `Comment` records in scene order.
+"""
+
+import json
+import struct
+from array import array
+
+import numpy as np
+
+from placement import (
+    Comment,
+    Placement,
+    format_color,
+    format_number,
+    section_marker,
+)
+
+# Serialized form (see PlacementBuffer.to_bytes):
+# magic, placements, matrices, length of the JSON tables
+_HEADER = struct.Struct("<4sIII")
+_MAGIC = b"PBF1"
+
+
+class PlacementBuffer:
+    """Append-only columnar store of placements and meta lines."""
+
+    __slots__ = (
+        "colors",
+        "positions",
+        "matrix_index",
+        "part_index",
+        "matrices",
+        "part_ids",
+        "comments",
+        "_matrix_lookup",
+        "_part_lookup",
+    )
+
+    def __init__(self):
+        self.colors = array("i")
+        self.positions = array("d")
+        self.matrix_index = array("I")
+        self.part_index = array("I")
+        self.matrices = []
+        self.part_ids = []
+        self.comments = []
+        self._matrix_lookup = {}
+        self._part_lookup = {}
+
+    @classmethod
+    def from_columns(
+        cls,
+        colors,
+        positions,
+        matrix_index,
+        matrices,
+        part_index,
+        part_ids,
+        comments=(),
+    ):
+        """
+        Build a buffer from already-interned columns in one block.
+
+        `colors`, `positions` (x, y, z per placement), `matrix_index` and
+        `part_index` are buffers of int32 / float64 / uint32 / uint32 data
+        (e.g. NumPy arrays); `matrices` and `part_ids` are the interned
+        tables and must not contain duplicates.
+        """
+
+        buffer = cls()
+        buffer.colors.frombytes(memoryview(colors).cast("B"))
+        buffer.positions.frombytes(memoryview(positions).cast("B"))
+        buffer.matrix_index.frombytes(memoryview(matrix_index).cast("B"))
+        buffer.part_index.frombytes(memoryview(part_index).cast("B"))
+
+        for matrix in matrices:
+            buffer.intern_matrix(matrix)
+        for part_id in part_ids:
+            buffer.intern_part(part_id)
+
+        buffer.comments.extend(comments)
+        return buffer
+
+    def to_bytes(self):
+        """
+        Serialize to a compact binary block.
+
+        Columns are written as raw little-endian arrays, followed by the
+        interned matrices (float64) and a small JSON table holding part ids
+        and comments.
+        """
+
+        tables = json.dumps(
+            {"part_ids": self.part_ids, "comments": self.comments},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+        matrices = array("d", (v for matrix in self.matrices for v in matrix))
+
+        return b"".join(
+            (
+                _HEADER.pack(_MAGIC, len(self), len(self.matrices), len(tables)),
+                self.colors.tobytes(),
+                self.positions.tobytes(),
+                self.matrix_index.tobytes(),
+                self.part_index.tobytes(),
+                matrices.tobytes(),
+                tables,
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Inverse of `to_bytes`; raises ValueError on truncated or corrupt data."""
+
+        data = memoryview(data)
+        if len(data) < _HEADER.size:
+            raise ValueError("Truncated PlacementBuffer header")
+
+        magic, count, matrix_count, tables_size = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a serialized PlacementBuffer")
+
+        layout = (
+            ("i", count),  # colors
+            ("d", 3 * count),  # positions
+            ("I", count),  # matrix_index
+            ("I", count),  # part_index
+            ("d", 9 * matrix_count),  # matrices
+        )
+        expected = _HEADER.size + tables_size + sum(
+            array(typecode).itemsize * size for typecode, size in layout
+        )
+        if len(data) != expected:
+            raise ValueError(
+                f"PlacementBuffer size mismatch: {len(data)} bytes, expected {expected}"
+            )
+
+        offset = _HEADER.size
+        columns = []
+        for typecode, size in layout:
+            column = array(typecode)
+            nbytes = column.itemsize * size
+            column.frombytes(data[offset : offset + nbytes])
+            columns.append(column)
+            offset += nbytes
+
+        colors, positions, matrix_index, part_index, matrices = columns
+        tables = json.loads(bytes(data[offset : offset + tables_size]))
+
+        if count and (
+            np.frombuffer(matrix_index, dtype=np.uint32).max() >= matrix_count
+            or np.frombuffer(part_index, dtype=np.uint32).max() >= len(tables["part_ids"])
+        ):
+            raise ValueError("PlacementBuffer index out of range")
+
+        return cls.from_columns(
+            colors,
+            positions,
+            matrix_index,
+            [tuple(matrices[9 * i : 9 * i + 9]) for i in range(matrix_count)],
+            part_index,
+            tables["part_ids"],
+            [tuple(comment) for comment in tables["comments"]],
+        )
+
+    def __len__(self):
+        """Number of placements (comments are not counted)."""
+
+        return len(self.colors)
+
+    # ------------------------------------------------------------------
+    # Interning
+    # ------------------------------------------------------------------
+
+    def intern_matrix(self, matrix):
+        matrix = tuple(matrix)
+        index = self._matrix_lookup.get(matrix)
+        if index is None:
+            index = len(self.matrices)
+            self.matrices.append(matrix)
+            self._matrix_lookup[matrix] = index
+        return index
+
+    def intern_part(self, part_id):
+        index = self._part_lookup.get(part_id)
+        if index is None:
+            index = len(self.part_ids)
+            self.part_ids.append(part_id)
+            self._part_lookup[part_id] = index
+        return index
+
+    # ------------------------------------------------------------------
+    # Appending
+    # ------------------------------------------------------------------
+
+    def add(self, color, x, y, z, matrix, part_id):
+        """Append a single placement."""
+
+        self.colors.append(color)
+        self.positions.extend((x, y, z))
+        self.matrix_index.append(self.intern_matrix(matrix))
+        self.part_index.append(self.intern_part(part_id))
+
+    def add_placement(self, placement):
+        self.add(
+            placement.color,
+            placement.x,
+            placement.y,
+            placement.z,
+            placement.matrix,
+            placement.part_id,
+        )
+
+    def add_array(self, color, positions, matrix, part_id):
+        """
+        Append many placements sharing color, matrix and part.
+
+        Parameters
+        ----------
+        positions : buffer
+            C-contiguous float64 data holding x, y, z per placement
+            (e.g. a NumPy array of shape (N, 3)). Copied in one block;
+            empty data (N = 0) appends nothing.
+        """
+
+        data = memoryview(positions)
+        if not data.nbytes:
+            return
+
+        start = len(self.positions)
+        self.positions.frombytes(data.cast("B"))
+        count = (len(self.positions) - start) // 3
+
+        self.colors.extend(array("i", [color]) * count)
+        self.matrix_index.extend(array("I", [self.intern_matrix(matrix)]) * count)
+        self.part_index.extend(array("I", [self.intern_part(part_id)]) * count)
+
+    def add_comment(self, text=""):
+        self.comments.append((len(self.colors), text))
+
+    def add_section(self, title):
+        """Open a BOM section (see `placement.section_marker`)."""
+
+        for comment in section_marker(title):
+            self.add_comment(comment.text)
+
+    def extend(self, other):
+        """Append another buffer, or an iterable of Placement/Comment records."""
+
+        if not isinstance(other, PlacementBuffer):
+            for item in other:
+                if isinstance(item, Comment):
+                    self.add_comment(item.text)
+                else:
+                    self.add_placement(item)
+            return
+
+        self._extend_columns(other, other.positions)
+
+    def extend_translated(self, other, dx, dy, dz):
+        """
+        Append another buffer moved by (dx, dy, dz) LDU.
+
+        Only positions change: colors, matrices and parts are copied as-is,
+        and the offset is applied to all positions in one NumPy add.
+        """
+
+        positions = np.frombuffer(other.positions, dtype=np.float64) + np.tile(
+            (dx, dy, dz), len(other)
+        )
+        # + 0.0 keeps -0.0 out of the output
+        self._extend_columns(other, array("d", (positions + 0.0).tobytes()))
+
+    def extend_transformed(self, other, matrix, dx, dy, dz):
+        """
+        Append another buffer transformed by `matrix`, then moved by
+        (dx, dy, dz) LDU.
+
+        `matrix` is a 3x3 LDraw matrix (a..i, row-major) applied about the
+        origin of `other`: positions become matrix @ p + offset and each
+        part matrix becomes matrix @ m. All positions are transformed in
+        one matmul, and the interned matrix table in one batched matmul,
+        so the cost does not depend on Python per-part arithmetic.
+        """
+
+        transform = np.asarray(matrix, dtype=np.float64).reshape(3, 3)
+
+        positions = np.frombuffer(other.positions, dtype=np.float64).reshape(-1, 3)
+        positions = positions @ transform.T + (dx, dy, dz)
+
+        tables = np.asarray(other.matrices, dtype=np.float64).reshape(-1, 3, 3)
+        composed = (transform @ tables).reshape(-1, 9) + 0.0
+
+        self._extend_columns(
+            other,
+            array("d", (positions + 0.0).tobytes()),
+            [tuple(row) for row in composed.tolist()],
+        )
+
+    def _extend_columns(self, other, positions, matrices=None):
+        offset = len(self.colors)
+
+        if matrices is None:
+            matrices = other.matrices
+
+        matrix_map = array("I", (self.intern_matrix(m) for m in matrices))
+        part_map = array("I", (self.intern_part(p) for p in other.part_ids))
+
+        self.colors.extend(other.colors)
+        self.positions.extend(positions)
+        self.matrix_index.extend(_remap(other.matrix_index, matrix_map))
+        self.part_index.extend(_remap(other.part_index, part_map))
+        self.comments.extend((offset + pos, text) for pos, text in other.comments)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def placement(self, index):
+        """Return placement `index` as a Placement record."""
+
+        x, y, z = self.positions[3 * index : 3 * index + 3]
+        return Placement(
+            self.colors[index],
+            x,
+            y,
+            z,
+            self.matrices[self.matrix_index[index]],
+            self.part_ids[self.part_index[index]],
+        )
+
+    def sections(self, initial="UNDEFINED"):
+        """
+        Yield (title, start, stop) placement ranges per BOM section.
+
+        Placements before the first section marker belong to `initial`.
+        Every marker yields a range, even an empty one, so the last title
+        yielded is the section still open at the end of the buffer.
+        """
+
+        title = initial
+        start = 0
+
+        for pos, text in self.comments:
+            section = Comment(text).section
+            if section is None:
+                continue
+            yield title, start, pos
+            title = section
+            start = pos
+
+        yield title, start, len(self)
+
+    def lines(self):
+        """
+        Yield LDraw lines in scene order.
+
+        Formats straight from the columns; the matrix and part suffix of
+        each interned (matrix, part) pair is formatted once.
+        """
+
+        suffixes = {}
+        color_texts = {}
+        positions = self.positions
+        comment_iter = iter(self.comments)
+        pending = next(comment_iter, None)
+
+        for index in range(len(self)):
+            while pending is not None and pending[0] <= index:
+                yield Comment(pending[1]).to_line()
+                pending = next(comment_iter, None)
+
+            key = (self.matrix_index[index], self.part_index[index])
+            suffix = suffixes.get(key)
+            if suffix is None:
+                matrix = " ".join(format_number(v) for v in self.matrices[key[0]])
+                suffix = f"{matrix} {self.part_ids[key[1]]}"
+                suffixes[key] = suffix
+
+            color = self.colors[index]
+            color_text = color_texts.get(color)
+            if color_text is None:
+                color_text = color_texts[color] = format_color(color)
+
+            x = format_number(positions[3 * index])
+            y = format_number(positions[3 * index + 1])
+            z = format_number(positions[3 * index + 2])
+            yield f"1 {color_text} {x} {y} {z} {suffix}"
+
+        while pending is not None:
+            yield Comment(pending[1]).to_line()
+            pending = next(comment_iter, None)
+
+    def __iter__(self):
+        comment_iter = iter(self.comments)
+        pending = next(comment_iter, None)
+
+        for index in range(len(self)):
+            while pending is not None and pending[0] <= index:
+                yield Comment(pending[1])
+                pending = next(comment_iter, None)
+            yield self.placement(index)
+
+        while pending is not None:
+            yield Comment(pending[1])
+            pending = next(comment_iter, None)
+
+
+def _remap(indices, mapping):
+    """Translate interned indices; no per-element work when tables line up."""
+
+    if all(new == old for old, new in enumerate(mapping)):
+        return indices
+
+    table = np.frombuffer(mapping, dtype=np.uint32)
+    remapped = table[np.frombuffer(indices, dtype=np.uint32)]
+    return array("I", remapped.tobytes())
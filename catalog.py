@@ -0,0 +1,163 @@
+"""catalog.py
+
+Part tables and the part catalog index.
+
+PLATES, BRICKS and TILES list the catalog parts by width then length.
+PART_CATALOG indexes them, with every other part this project places, by
+part id (without ".dat") -> (category, width, length). It is built once at
+import; plate, brick, tile and bom all read sizes and categories from it.
+"""
+
+PLATES = {
+    1: {
+        1: "3024.dat",  # Plate 1 x 1
+        2: "3023.dat",  # Plate 1 x 2
+        3: "3623.dat",  # Plate 1 x 3
+        4: "3710.dat",  # Plate 1 x 4
+        6: "3666.dat",  # Plate 1 x 6
+        8: "3460.dat",  # Plate 1 x 8
+        10: "4477.dat",  # Plate 1 x 10
+        12: "60479.dat",  # Plate 1 x 12
+    },
+    2: {
+        2: "3022.dat",  # Plate 2 x 2
+        3: "3021.dat",  # Plate 2 x 3
+        4: "3020.dat",  # Plate 2 x 4
+        6: "3795.dat",  # Plate 2 x 6
+        8: "3034.dat",  # Plate 2 x 8
+        10: "3832.dat",  # Plate 2 x 10
+        12: "2445.dat",  # Plate 2 x 12
+    },
+}
+
+
+BRICKS = {
+    1: {
+        1: "3005.dat",  # Brick 1x1
+        2: "3004.dat",  # Brick 1x2
+        3: "3622.dat",  # Brick 1x3
+        4: "3010.dat",  # Brick 1x4
+        6: "3009.dat",  # Brick 1x6
+        8: "3008.dat",  # Brick 1x8
+    },
+    2: {
+        2: "3003.dat",  # Brick 2x2
+        3: "3002.dat",  # Brick 2x3
+        4: "3001.dat",  # Brick 2x4
+        6: "2456.dat",  # Brick 2x6
+        8: "3007.dat",  # Brick 2x8
+    },
+}
+
+
+TILES = {
+    1: {
+        1: "3070b.dat",  # Tile 1x1
+        2: "3069b.dat",  # Tile 1x2
+        3: "63864.dat",  # Tile 1x3
+        4: "2431b.dat",  # Tile 1x4
+        6: "6636.dat",  # Tile 1x6
+        8: "4162.dat",  # Tile 1x8
+    },
+    2: {
+        2: "3068b.dat",  # Tile 2x2
+        3: "26603.dat",  # Tile 2x3
+        4: "87079.dat",  # Tile 2x4
+        6: "69729.dat",  # Tile 2x6
+    },
+}
+
+
+# ============================================================
+# INDEX
+# ============================================================
+
+
+def _build_part_catalog():
+    """
+    Build the part index once: part id (without ".dat") ->
+    (category, width, length).
+
+    `width` / `length` are the stud size of catalog plates, bricks and
+    tiles, None otherwise. When a part matches several rules, the first
+    registered one wins (same priority as the original rule order).
+    """
+
+    catalog = {}
+
+    def register(part_id, category, width=None, length=None):
+        catalog.setdefault(part_id.replace(".dat", ""), (category, width, length))
+
+    def register_sizes(table, category):
+        for width, length_dict in table.items():
+            for length, ref in length_dict.items():
+                register(ref, category, width, length)
+
+    # ==================================================
+    # BASEPLATE
+    # ==================================================
+    register("3811", "PLATE_32x32")
+
+    # ==================================================
+    # MINIFIG CORE PARTS (heads: see bom.MINIFIG_HEAD_PREFIX)
+    # ==================================================
+    register("973", "MINIFIG_TORSO")
+
+    for part in ("3818", "3819"):
+        register(part, "MINIFIG_ARMS")
+
+    register("3820", "MINIFIG_HANDS")
+
+    for part in ("3815", "3816", "3817", "87609"):
+        register(part, "MINIFIG_LEGS")
+
+    # ==================================================
+    # MINIFIG ACCESSORIES
+    # ==================================================
+    register("88646", "MINIFIG_ACCESSORY")  # neck bracket
+    register("30414", "MINIFIG_ACCESSORY")  # armor
+
+    # ==================================================
+    # BRICKS
+    # ==================================================
+    register_sizes(BRICKS, "BRICKS")
+
+    # ==================================================
+    # TILES
+    # ==================================================
+    register_sizes(TILES, "TILES")
+
+    # ==================================================
+    # STANDARD PLATES
+    # ==================================================
+    register("3024", "PLATE_1x1", 1, 1)
+
+    register_sizes(PLATES, "PLATES")
+
+    # ==================================================
+    # MODIFIED PLATES
+    # ==================================================
+    register("2431", "PLATES_MODIFIED")
+
+    return catalog
+
+
+PART_CATALOG = _build_part_catalog()
+
+
+# Categories whose parts each get_*_size helper reports
+PLATE_CATEGORIES = ("PLATE_1x1", "PLATES")
+BRICK_CATEGORIES = ("BRICKS",)
+TILE_CATEGORIES = ("TILES",)
+
+
+def catalog_size(part_id, categories):
+    """
+    Return the (width, length) of a catalog part in one of `categories`.
+    Returns None if not found.
+    """
+
+    entry = PART_CATALOG.get(part_id.replace(".dat", ""))
+    if entry is None or entry[0] not in categories or entry[1] is None:
+        return None
+    return entry[1], entry[2]
@@ -0,0 +1,46 @@
+"""colors.py
+
+LDraw color table.
+
+Colors are stored as LDraw color codes everywhere (placements, BOM keys).
+This table interns the display name and the BrickLink color id of each code
+used by the project, so BOM reports and wanted lists can be produced
+without re-reading the model.
+"""
+
+# Inherit the color of the referencing line (submodel instances)
+MAIN_COLOR = 16
+
+# Codes from here up are direct colors (0x2RRGGBB)
+DIRECT_COLOR_MIN = 0x2000000
+
+# LDraw code -> (name, BrickLink color id)
+LDRAW_COLORS = {
+    0: ("Black", 11),
+    1: ("Blue", 7),
+    2: ("Green", 6),
+    4: ("Red", 5),
+    14: ("Yellow", 3),
+    15: ("White", 1),
+    19: ("Tan", 2),
+    71: ("Light Bluish Gray", 86),
+    72: ("Dark Bluish Gray", 85),
+}
+
+
+def color_name(code):
+    """Display name of an LDraw color code (falls back to the code)."""
+
+    entry = LDRAW_COLORS.get(code)
+    if entry:
+        return entry[0]
+    if code >= DIRECT_COLOR_MIN:
+        return f"Direct color 0x{code:X}"
+    return f"Color {code}"
+
+
+def bricklink_color_id(code):
+    """BrickLink color id of an LDraw color code, or None if unknown."""
+
+    entry = LDRAW_COLORS.get(code)
+    return entry[1] if entry else None
@@ -2,6 +2,11 @@
 
 Scene coordinate helpers.
 
+`SceneContext` also carries a transform stack (local -> world space).
+Leaf builders (baseplates, plates, rasterized text, minifigs) build in
+local coordinates and pass their output through `ctx.apply`, so a block
+built once can be stamped at many positions and orientations.
+
 This project generates LDraw (.ldr) models that are meant to be opened in
 BrickLink Studio.
 
@@ -16,7 +21,11 @@ Do **not** "clean up" these formulas unless you also regenerate the reference
 output files and validate the visual result in Studio.
 """
 
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+
+from buffer import PlacementBuffer
+from placement import IDENTITY
 
 
 # LDraw units (LDU)
@@ -24,6 +33,27 @@ STUD = 20
 PLATE_HEIGHT = 8
 BASEPLATE_THICKNESS = 8  # 3811.dat (32x32 baseplate) is 1 plate thick
 
+NO_OFFSET = (0, 0, 0)
+
+
+def compose_matrices(m, n):
+    """Return m @ n for two row-major 3x3 LDraw matrices."""
+
+    return tuple(
+        sum(m[3 * r + k] * n[3 * k + c] for k in range(3))
+        for r in range(3)
+        for c in range(3)
+    )
+
+
+def transform_point(matrix, offset, x, y, z):
+    """Return matrix @ (x, y, z) + offset."""
+
+    return tuple(
+        matrix[3 * r] * x + matrix[3 * r + 1] * y + matrix[3 * r + 2] * z + offset[r]
+        for r in range(3)
+    )
+
 
 @dataclass
 class SceneContext:
@@ -33,6 +63,12 @@ class SceneContext:
     # Kept as-is to preserve existing output.
     ground_y: float = 0.0
 
+    # Transform stack: (matrix, offset in LDU) from local to world space.
+    # Leaf builders apply the top entry to what they emit (see `apply`).
+    transforms: list = field(
+        default_factory=lambda: [(IDENTITY, NO_OFFSET)], repr=False
+    )
+
     def studs(self, value):
         """Convert studs to LDraw units (LDU)."""
 
@@ -50,6 +86,92 @@ class SceneContext:
 
         return self.ground_y - BASEPLATE_THICKNESS / 2
 
+    # ------------------------------------------------------------------
+    # Transform stack
+    # ------------------------------------------------------------------
+
+    @property
+    def transform(self):
+        """Current (matrix, offset) from local to world space."""
+
+        return self.transforms[-1]
+
+    @property
+    def is_identity(self):
+        return self.transforms[-1] == (IDENTITY, NO_OFFSET)
+
+    def push_transform(self, matrix=IDENTITY, translate=NO_OFFSET):
+        """
+        Enter a local space: rotate by `matrix`, then translate by
+        `translate` (LDU), relative to the current space.
+        """
+
+        parent_matrix, parent_offset = self.transforms[-1]
+        matrix = compose_matrices(parent_matrix, tuple(matrix))
+        offset = transform_point(parent_matrix, parent_offset, *translate)
+        self.transforms.append((matrix, offset))
+
+    def pop_transform(self):
+        if len(self.transforms) == 1:
+            raise IndexError("Cannot pop the root transform")
+        self.transforms.pop()
+
+    @contextmanager
+    def transformed(self, matrix=IDENTITY, translate=NO_OFFSET):
+        """`push_transform` for the duration of a `with` block."""
+
+        self.push_transform(matrix, translate)
+        try:
+            yield self
+        finally:
+            self.pop_transform()
+
+    @contextmanager
+    def local(self):
+        """
+        Build in local space (identity transform) for the duration of a
+        `with` block, e.g. a block built once and stamped with `apply`.
+        """
+
+        saved = self.transforms
+        self.transforms = [(IDENTITY, NO_OFFSET)]
+        try:
+            yield self
+        finally:
+            self.transforms = saved
+
+    def apply(self, block):
+        """
+        Return `block` (a PlacementBuffer) in world space.
+
+        The whole block is transformed in one batch; under the identity
+        transform it is returned as-is.
+        """
+
+        if self.is_identity:
+            return block
+
+        matrix, (dx, dy, dz) = self.transforms[-1]
+        out = PlacementBuffer()
+        out.extend_transformed(block, matrix, dx, dy, dz)
+        return out
+
+    def apply_placement(self, placement):
+        """Single-record variant of `apply`."""
+
+        if self.is_identity:
+            return placement
+
+        matrix, offset = self.transforms[-1]
+        x, y, z = transform_point(matrix, offset, placement.x, placement.y, placement.z)
+        return replace(
+            placement,
+            x=x,
+            y=y,
+            z=z,
+            matrix=compose_matrices(matrix, placement.matrix),
+        )
+
 
 def grid_center_in_studs(cols, rows, studs_per_plate=32, origin_x_stud=0, origin_z_stud=0):
     """Return the geometric center of a baseplate grid, in *stud* coordinates.
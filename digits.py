@@ -21,9 +21,15 @@ differently, we explicitly flip the digit vertically when placing studs so that
 row 0 of the pattern is visually at the top in BrickLink Studio.
 """
 
-from context import PLATE_HEIGHT
+from functools import lru_cache
 
-PLATE_1x1 = "3024.dat"
+from raster import (
+    PLATE_1x1,
+    compile_glyphs,
+    layout_glyphs,
+    rasterize,
+    rasterize_merged,
+)
 
 
 # Digits: 5x7 pixel patterns, '#' = stud occupied by a 1x1 plate
@@ -121,31 +127,23 @@ DIGITS_5x7 = {
 }
 
 
-def render_text_5x7(text, gap=1):
-    """Build a 5x7 matrix (list of strings) from a string of digits."""
+# Compiled once at import: filled (col, row) offsets + size per digit
+DIGIT_GLYPHS = compile_glyphs(DIGITS_5x7)
 
-    if not text:
-        raise ValueError("Empty text")
-
-    for ch in text:
-        if ch not in DIGITS_5x7:
-            raise ValueError(f"Unsupported character: {ch!r}")
 
-    height = 7
-    rows = [""] * height
+@lru_cache(maxsize=4096)
+def layout_digits(text, gap=1):
+    """Lay out a string of digits (cached by text and gap)."""
 
-    for i, ch in enumerate(text):
-        digit = DIGITS_5x7[ch]
-        for r in range(height):
-            rows[r] += digit[r]
-        if i < len(text) - 1:
-            for r in range(height):
-                rows[r] += "." * gap
+    if not text:
+        raise ValueError("Empty text")
 
-    return rows
+    return layout_glyphs(DIGIT_GLYPHS, text, gap)
 
 
-def build_centered_digit(ctx, text, center_stud_x, center_stud_z, color=15):
+def build_centered_digit(
+    ctx, text, center_stud_x, center_stud_z, color=15, merge=False
+):
     """
     Render a digit (or multi-digit string) centered at a given stud position.
 
@@ -161,6 +159,8 @@ def build_centered_digit(ctx, text, center_stud_x, center_stud_z, color=15):
         Z coordinate of the desired center in stud space.
     color : int
         LDraw color code for the plates.
+    merge : bool
+        Merge runs of pixels into 1xN plates instead of 1x1 plates only.
 
     Notes
     -----
@@ -171,11 +171,11 @@ def build_centered_digit(ctx, text, center_stud_x, center_stud_z, color=15):
       with the physical stud grid.
     """
 
-    # Generate the 5x7 bitmap matrix (list of strings)
-    matrix = render_text_5x7(text)
+    # Lay out the 5x7 glyphs (filled pixel offsets, cached per string)
+    layout = layout_digits(text)
 
-    height = len(matrix)  # number of rows (typically 7)
-    width = len(matrix[0])  # number of columns (typically 5 per digit)
+    height = layout.height  # number of rows (typically 7)
+    width = layout.width  # number of columns (typically 5 per digit)
 
     # ---------------------------------------------------------------------
     # Stud grid alignment correction
@@ -192,33 +192,11 @@ def build_centered_digit(ctx, text, center_stud_x, center_stud_z, color=15):
     origin_x = center_stud_x - (width - 1) / 2 + half_stud
     origin_z = center_stud_z - (height - 1) / 2 + half_stud
 
-    lines = []
-
-    # Iterate through the bitmap
-    for row_idx, row in enumerate(matrix):
-        for col_idx, pixel in enumerate(row):
-
-            # Only place plates where the bitmap contains a filled pixel
-            if pixel != "#":
-                continue
-
-            # Compute stud position of this pixel
-            stud_x = origin_x + col_idx
-
-            # Vertical inversion: bitmap row 0 is top visually,
-            # but increasing Z moves "up" in the scene.
-            stud_z = origin_z + (height - 1 - row_idx)
-
-            # Convert stud coordinates to LDraw units (LDUs)
-            x = ctx.studs(stud_x)
-            z = ctx.studs(stud_z)
-
-            # Plates sit exactly on top of the baseplate surface
-            y = ctx.baseplate_top_origin_y
+    # Vertical inversion: bitmap row 0 is top visually,
+    # but increasing Z moves "up" in the scene.
+    top_z = origin_z + (height - 1)
 
-            # Emit LDraw Type-1 line (1x1 plate)
-            lines.append(
-                f"1 {color} {x:.6f} {y:.6f} {z:.6f} 1 0 0 0 1 0 0 0 1 {PLATE_1x1}"
-            )
+    if merge:
+        return rasterize_merged(ctx, layout, origin_x, top_z, color)
 
-    return lines
+    return rasterize(ctx, layout, origin_x, top_z, color, PLATE_1x1)
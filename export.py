@@ -0,0 +1,141 @@
+"""export.py
+
+Streaming LDraw writer.
+
+Scene blocks (PlacementBuffer, or iterables of Placement/Comment records) are
+written to a buffered file handle as they are produced, and the BOM is
+accumulated on the way. Only the block being written is held in memory.
+
+MPD export
+----------
+When submodels are given, the file is written as a multi-part document:
+
+    0 FILE <main model>
+    ... streamed blocks ...
+    0 NOFILE
+    0 FILE <submodel>
+    ... submodel lines ...
+    0 NOFILE
+
+Placements whose part id is a submodel name are references (instances).
+The BOM expands them into the submodel's parts.
+
+A `RenderedBlock` carries its LDraw text, already formatted (e.g. read back
+from block_cache.py); it is written verbatim.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+from bom import BomAccumulator
+from buffer import PlacementBuffer
+
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+@dataclass(frozen=True)
+class RenderedBlock:
+    """A block together with its LDraw text (lines joined by newlines)."""
+
+    buffer: PlacementBuffer
+    text: str
+
+    @classmethod
+    def render(cls, buffer):
+        return cls(buffer, "\n".join(buffer.lines()))
+
+
+class LDrawWriter:
+    """
+    Incremental .ldr writer.
+
+    Usage:
+
+        with LDrawWriter(path) as writer:
+            for block in blocks:
+                writer.write(block)
+        bom = writer.bom
+    """
+
+    def __init__(self, path, submodels=None, buffer_size=WRITE_BUFFER_SIZE):
+        self.path = Path(path)
+        self.submodels = dict(submodels or {})
+        self.buffer_size = buffer_size
+        self._bom = BomAccumulator(self.submodels)
+        self._handle = None
+        self._first = True
+
+    def __enter__(self):
+        self._handle = self.path.open(
+            "w", encoding="utf-8", newline="\n", buffering=self.buffer_size
+        )
+        self._first = True
+
+        if self.submodels:
+            self._write_lines([f"0 FILE {self.path.name}"])
+
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None and self.submodels:
+                self._write_submodels()
+        finally:
+            self._handle.close()
+            self._handle = None
+
+    @property
+    def bom(self):
+        """BOM of everything written so far (grouped by section)."""
+
+        return self._bom.bom
+
+    def write(self, block):
+        """Write one block and add it to the BOM."""
+
+        if isinstance(block, RenderedBlock):
+            if block.text:
+                self._write_lines([block.text])
+            self._bom.add(block.buffer)
+            return
+
+        if isinstance(block, PlacementBuffer):
+            lines = block.lines()
+        else:
+            block = list(block)
+            lines = (item.to_line() for item in block)
+
+        self._write_lines(lines)
+        self._bom.add(block)
+
+    def _write_submodels(self):
+        self._write_lines(["0 NOFILE"])
+
+        for name, submodel in self.submodels.items():
+            self._write_lines([f"0 FILE {name}"])
+            self._write_lines(submodel.lines())
+            self._write_lines(["0 NOFILE"])
+
+    def _write_lines(self, lines):
+        write = self._handle.write
+
+        # Lines are newline-separated (no trailing newline at end of file)
+        for line in lines:
+            if self._first:
+                self._first = False
+            else:
+                write("\n")
+            write(line)
+
+
+def write_ldr(path, blocks, submodels=None):
+    """
+    Stream `blocks` to `path` and return the BOM.
+
+    With `submodels` ({name: PlacementBuffer}) the file is an MPD document.
+    """
+
+    with LDrawWriter(path, submodels) as writer:
+        for block in blocks:
+            writer.write(block)
+    return writer.bom
@@ -0,0 +1,232 @@
+"""ldraw.py
+
+Bulk LDraw reader for large .ldr / .mpd files (e.g. Studio exports of whole
+venue mock-ups).
+
+The file is scanned once: meta lines (type-0) are kept as comments,
+"0 FILE" / "0 NOFILE" split the document into submodels, and type-1 lines
+are collected in chunks of CHUNK_LINES. Each chunk's numbers are converted
+in one call to NumPy's text parser and sliced into columns; matrices and
+part ids are interned through dicts. Chunks are appended to one
+`PlacementBuffer` per model, so parsed models plug straight into the BOM
+and the exporter, and at most one chunk of lines is held as Python strings
+at any time.
+
+Geometry lines (types 2-5) are not parts and are skipped. Direct colors
+(0x2RRGGBB) are stored as their integer code and written back in hex.
+
+Files are read through a read-only memory map and decoded line by line
+(`iter_ldraw_lines`), so scanning a reference model does not hold the
+whole file in memory as a string.
+"""
+
+import mmap
+from pathlib import Path
+
+import numpy as np
+
+from buffer import PlacementBuffer
+
+# Type-1 fields: "1 color x y z a b c d e f g h i part"
+TYPE1_FIELDS = 15
+NUMERIC_FIELDS = TYPE1_FIELDS - 1
+
+# Type-1 lines converted per batch (bounds the Python strings held at once)
+CHUNK_LINES = 1 << 16
+
+
+def _split_type1(lines):
+    """Split type-1 lines into (numeric heads, part ids)."""
+
+    heads = []
+    part_ids = []
+
+    for line in lines:
+        fields = line.split(None, NUMERIC_FIELDS)
+        if len(fields) < TYPE1_FIELDS:
+            raise ValueError(f"Not a type-1 line: {line!r}")
+        # Part names may contain spaces: keep the tail as-is
+        heads.append(fields[:NUMERIC_FIELDS])
+        part_ids.append(fields[NUMERIC_FIELDS])
+
+    return heads, part_ids
+
+
+def _parse_numbers(lines):
+    """
+    Return ((N, 13) float64 array, part ids) for N type-1 lines.
+
+    Columns are color, x, y, z and the 9 matrix values. Fast path: one
+    `rpartition` per line, then all numbers are converted by NumPy's C
+    text parser. Lines it cannot handle (part names with spaces, direct
+    colors such as 0x2FF0000) fall back to `_split_type1`.
+    """
+
+    heads = []
+    part_ids = []
+    for line in lines:
+        head, _, part_id = line.rpartition(" ")
+        heads.append(head)
+        part_ids.append(part_id)
+
+    try:
+        numbers = np.loadtxt(heads, dtype=np.float64, ndmin=2)
+    except ValueError:
+        numbers = None
+
+    if numbers is None or numbers.shape != (len(lines), NUMERIC_FIELDS):
+        rows, part_ids = _split_type1(lines)
+        numbers = np.array(
+            [[int(row[1], 0)] + [float(v) for v in row[2:]] for row in rows],
+            dtype=np.float64,
+        )
+        return numbers, part_ids
+
+    return numbers[:, 1:], part_ids
+
+
+def _intern_rows(rows):
+    """Intern equal rows of a 2-D float64 array: (unique rows, index)."""
+
+    # + 0.0 folds -0.0 into 0.0 so equal matrices share one key
+    data = np.ascontiguousarray(rows + 0.0).tobytes()
+    width = rows.shape[1] * rows.itemsize
+    lookup = {}
+    index = np.fromiter(
+        (
+            lookup.setdefault(data[start : start + width], len(lookup))
+            for start in range(0, len(data), width)
+        ),
+        dtype=np.uint32,
+        count=len(rows),
+    )
+    table = [tuple(np.frombuffer(key, dtype=rows.dtype).tolist()) for key in lookup]
+    return table, index
+
+
+def _intern_values(values):
+    """Intern a list of hashable values: (unique values, index)."""
+
+    lookup = {}
+    index = np.fromiter(
+        (lookup.setdefault(value, len(lookup)) for value in values),
+        dtype=np.uint32,
+        count=len(values),
+    )
+    return list(lookup), index
+
+
+def build_buffer(lines, comments=()):
+    """Build a PlacementBuffer from type-1 lines in one vectorized pass."""
+
+    if not lines:
+        buffer = PlacementBuffer()
+        buffer.comments.extend(comments)
+        return buffer
+
+    numbers, part_ids = _parse_numbers(lines)
+
+    colors = numbers[:, 0].astype(np.int32)
+    positions = np.ascontiguousarray(numbers[:, 1:4])
+    matrices, matrix_index = _intern_rows(numbers[:, 4:])
+    part_table, part_index = _intern_values(part_ids)
+
+    return PlacementBuffer.from_columns(
+        colors,
+        positions,
+        matrix_index,
+        matrices,
+        part_index,
+        part_table,
+        comments,
+    )
+
+
+def parse_ldraw_lines(lines, name="main.ldr", chunk_lines=CHUNK_LINES):
+    """
+    Parse LDraw lines into {model name: PlacementBuffer}.
+
+    Models appear in file order; the first one is the main model. A file
+    without "0 FILE" lines is a single model called `name`. Type-1 lines
+    are converted every `chunk_lines` lines.
+    """
+
+    models = {}
+    current = name
+    explicit = False  # current model was opened by "0 FILE"
+    buffer = PlacementBuffer()
+    type1 = []
+    comments = []  # positions relative to the pending chunk
+
+    def flush_chunk():
+        if type1 or comments:
+            buffer.extend(build_buffer(type1, comments))
+            type1.clear()
+            comments.clear()
+
+    def flush():
+        flush_chunk()
+        if explicit or len(buffer) or buffer.comments or not models:
+            models[current] = buffer
+
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
+
+        kind = line[0]
+
+        if kind == "1" and line[1:2] in (" ", "\t"):
+            type1.append(line)
+            if len(type1) >= chunk_lines:
+                flush_chunk()
+            continue
+
+        if kind != "0":
+            continue
+
+        meta = line[1:].strip()
+
+        if meta.startswith("FILE "):
+            if explicit or type1 or comments or len(buffer) or buffer.comments:
+                flush()
+            current = meta[5:].strip()
+            explicit = True
+            buffer = PlacementBuffer()
+            continue
+
+        if meta == "NOFILE":
+            continue
+
+        # Keep comment text verbatim (only the "0 " prefix is dropped)
+        comments.append((len(type1), raw.lstrip()[2:]))
+
+    flush()
+    return models
+
+
+def iter_ldraw_lines(path):
+    """
+    Yield the lines of an LDraw file lazily, without line endings.
+
+    The file is memory-mapped; only the current line is decoded, so files
+    of hundreds of MB can be scanned in constant memory.
+    """
+
+    with Path(path).open("rb") as handle:
+        try:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return
+
+        with mapped:
+            for raw in iter(mapped.readline, b""):
+                yield raw.decode("utf-8").rstrip("\r\n")
+
+
+def parse_ldraw(path):
+    """Parse an .ldr / .mpd file into {model name: PlacementBuffer}."""
+
+    path = Path(path)
+    return parse_ldraw_lines(iter_ldraw_lines(path), name=path.name)
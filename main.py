@@ -5,25 +5,40 @@ Generate an LDraw model:
   - a single centered digit "0" (as 1x1 plates)
   - the minifig template (optional)
 
+The plan itself (baseplate grid, tables, seats, text) is read from a venue
+file, see venue.py and venues/default.json.
+
 Open the generated .ldr file in BrickLink Studio to preview.
 """
 
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import astuple
 from pathlib import Path
 
 from baseplate import build_baseplate_grid
-from bom import generate_bom_from_lines, print_bom, print_global_summary
+from block_cache import BlockCache
+from buffer import PlacementBuffer
+from bom import build_bom_report, print_bom, print_global_summary
+from bom_export import write_bom_csv, write_bom_json, write_bricklink_xml
 from context import SceneContext
 from digits import build_centered_digit
-from minifig import build_minifig
+from export import RenderedBlock, write_ldr
+from minifig import (
+    MINIFIG_SUBMODEL,
+    build_minifig,
+    build_minifig_ref,
+    build_minifig_submodel,
+    compile_template,
+)
+from occupancy import OccupancyGrid, print_overlap_report
+from placement import IDENTITY, rotation_y
 from plate import build_plate, build_plate_rotated
-from template import load_template, normalize_template_inplace
-from text import build_text_from_top_left, LETTERS_5x7
-
+from template_cache import load_normalized_template
+from text import build_text_from_top_left, layout_letters
+from venue import DEFAULT_LAYOUT, DEFAULT_SEATS, load_venue
 
-def add_section(lines, title):
-    lines.append("0")
-    lines.append(f"0 ===== {title} =====")
-    lines.append("0")
+GROUP_SUBMODEL = "group.ldr"
 
 
 def build_group_frame(ctx, center_stud_x, center_stud_z, color=15):
@@ -40,7 +55,7 @@ def build_group_frame(ctx, center_stud_x, center_stud_z, color=15):
         - LDraw coordinates represent the CENTER of the plate
     """
 
-    lines = []
+    placements = PlacementBuffer()
 
     width = 32
     height = 30
@@ -62,7 +77,7 @@ def build_group_frame(ctx, center_stud_x, center_stud_z, color=15):
 
         for length in horizontal_segments:
             x_center = x_start + (length - 1) / 2
-            lines.append(build_plate(ctx, x_center, z_edge, color, length))
+            placements.add_placement(build_plate(ctx, x_center, z_edge, color, length))
             x_start += length
 
     # --------------------------------
@@ -75,105 +90,325 @@ def build_group_frame(ctx, center_stud_x, center_stud_z, color=15):
 
         for length in vertical_segments:
             z_center = z_start + (length - 1) / 2
-            lines.append(build_plate_rotated(ctx, x_edge, z_center, color, length))
+            placements.add_placement(
+                build_plate_rotated(ctx, x_edge, z_center, color, length)
+            )
             z_start += length
 
-    return lines
+    return placements
+
+
+def build_group_body(
+    ctx, template, center_stud_x, center_stud_z, instanced=False, seats=DEFAULT_SEATS
+):
+    """
+    Build the part of a group shared by every group: minifigs + frame.
+
+    One minifig per seat; `seats` are (x, z, facing) stud offsets from the
+    group center and Y rotations in degrees (see venue.py). Each minifig
+    follows a "-- Seat N --" marker (N from 0, as in minifig_index), so the
+    occupancy grid checks guests against each other.
+
+    With `instanced`, each minifig is a single reference to the
+    MINIFIG_SUBMODEL instead of a copy of every template line.
+    """
+
+    items = PlacementBuffer()
+
+    items.add_comment("-- Minifigures --")
+
+    for seat, (x_offset, z_offset, facing) in enumerate(seats):
+
+        items.add_comment(f"-- Seat {seat} --")
+
+        fx = center_stud_x + x_offset
+        fz = center_stud_z + z_offset
+        matrix = rotation_y(facing) if facing else IDENTITY
+
+        if instanced:
+            items.extend(build_minifig_ref(ctx, stud_x=fx, stud_z=fz, matrix=matrix))
+            continue
 
+        items.extend(
+            build_minifig(
+                ctx,
+                template,
+                stud_x=fx,
+                stud_z=fz,
+                matrix=matrix,
+            )
+        )
+
+    items.add_comment("-- Frame --")
+
+    items.extend(build_group_frame(ctx, center_stud_x, center_stud_z))
+
+    return items
+
+
+def build_group(
+    ctx,
+    template,
+    digit,
+    center_stud_x,
+    center_stud_z,
+    color=15,
+    merge=False,
+    instanced=False,
+    body=None,
+    submodel=GROUP_SUBMODEL,
+):
+    """
+    Build one group: digit + minifigs + frame.
+
+    With `instanced`, minifigs and frame are a single reference to the
+    group `submodel` (see `build_submodels`); only the digit is built here.
 
-def build_group(ctx, template, digit, center_stud_x, center_stud_z, color=15):
+    Otherwise minifigs and frame are stamped from `body`, the group body
+    built once in local space around (0, 0) (see `build_local_group_body`).
+    """
 
-    lines = []
+    items = PlacementBuffer()
 
-    add_section(lines, f"GROUP {digit}")
+    items.add_section(f"GROUP {digit}")
 
-    lines.append(f"0 -- Digit {digit} --")
+    items.add_comment(f"-- Digit {digit} --")
 
-    lines.extend(
+    items.extend(
         build_centered_digit(
             ctx,
             digit,
             center_stud_x,
             center_stud_z,
             color,
+            merge=merge,
         )
     )
 
-    lines.append("0 -- Minifigures --")
+    if instanced:
+        items.add_comment("-- Minifigures + Frame --")
+        ref = PlacementBuffer()
+        ref.add(
+            16,
+            ctx.studs(center_stud_x),
+            0,
+            ctx.studs(center_stud_z),
+            IDENTITY,
+            submodel,
+        )
+        items.extend(ctx.apply(ref))
+        return items
+
+    if body is None:
+        body = build_local_group_body(ctx, template)
 
-    spacing = 8
-    cols = 4
-    rows = 3
+    translate = (ctx.studs(center_stud_x), 0, ctx.studs(center_stud_z))
+    with ctx.transformed(translate=translate):
+        items.extend(ctx.apply(body))
 
-    for row in range(rows):
-        for col in range(cols):
+    return items
 
-            if row == 1 and col in (1, 2):
-                continue
 
-            x_offset = (col - (cols - 1) / 2) * spacing
-            z_offset = (row - (rows - 1) / 2) * spacing
+def build_local_group_body(ctx, template, seats=DEFAULT_SEATS):
+    """Group body (minifigs + frame) around (0, 0), ignoring ctx transforms."""
 
-            fx = center_stud_x + x_offset
-            fz = center_stud_z + z_offset
+    with ctx.local():
+        return build_group_body(ctx, template, 0, 0, seats=seats)
 
-            lines.extend(
-                build_minifig(
-                    ctx,
-                    template,
-                    stud_x=fx,
-                    stud_z=fz,
-                )
+
+def group_submodel_name(seat_layout):
+    """MPD name of the group submodel for one seat layout."""
+
+    if seat_layout == DEFAULT_LAYOUT:
+        return GROUP_SUBMODEL
+    return f"group-{seat_layout}.ldr"
+
+
+def build_submodels(ctx, template, venue):
+    """
+    Submodels referenced by an instanced (MPD) scene.
+
+    One group submodel per seat layout used by the venue, built around
+    (0, 0); each group reference translates it to the group center.
+    """
+
+    submodels = {}
+
+    for table in venue.tables:
+        name = group_submodel_name(table.seat_layout)
+        if name not in submodels:
+            submodels[name] = build_group_body(
+                ctx, template, 0, 0, instanced=True, seats=venue.seats(table)
             )
 
-    lines.append("0 -- Frame --")
+    submodels[MINIFIG_SUBMODEL] = build_minifig_submodel(template)
+    return submodels
+
+
+def _context_key(ctx):
+    """Cache key part for everything `ctx` contributes to a block."""
+
+    return [ctx.ground_y, ctx.transform]
 
-    lines.extend(build_group_frame(ctx, center_stud_x, center_stud_z))
 
-    return lines
+def _template_key(template):
+    return hashlib.sha256(compile_template(template).to_bytes()).hexdigest()
 
 
-def build_groups_grid(ctx, template, cols, rows, color=15):
+class _GroupBuilder:
+    """Builds the group of one venue table; shared by in-process and pool builds."""
+
+    def __init__(self, ctx, template, venue, merge, instanced):
+        self.ctx = ctx
+        self.template = template
+        self.venue = venue
+        self.merge = merge
+        self.instanced = instanced
+        self.bodies = {}
+        self._scene_key = None
+
+    def build(self, table):
+        body = None
+        if not self.instanced:
+            body = self.bodies.get(table.seat_layout)
+            if body is None:
+                body = build_local_group_body(
+                    self.ctx, self.template, self.venue.seats(table)
+                )
+                self.bodies[table.seat_layout] = body
+
+        return build_group(
+            self.ctx,
+            self.template,
+            table.label,
+            table.x,
+            table.z,
+            table.color,
+            merge=self.merge,
+            instanced=self.instanced,
+            body=body,
+            submodel=group_submodel_name(table.seat_layout),
+        )
 
-    studs_per_plate = 32
-    lines = []
+    def key(self, table):
+        """Cache key parts of the group of `table` (see block_cache.py)."""
 
-    add_section(lines, "ALL GROUPS")
+        if self._scene_key is None:
+            self._scene_key = [
+                _context_key(self.ctx),
+                _template_key(self.template),
+                self.merge,
+                self.instanced,
+            ]
 
-    group_index = 1
+        return [
+            "group",
+            self._scene_key,
+            table.label,
+            table.x,
+            table.z,
+            table.color,
+            self.venue.seats(table),
+            group_submodel_name(table.seat_layout),
+        ]
 
-    for r in range(rows):
-        for c in range(cols):
 
-            if group_index > 10:
-                break
+# Per-process builder of pool workers (see `_init_group_worker`)
+_worker_builder = None
 
-            row_offset = 1
 
-            if group_index == 10:
-                center_x = (cols // 2) * studs_per_plate
-                center_z = (rows - 1 - r - row_offset) * studs_per_plate
+def _init_group_worker(ctx, template, venue, merge, instanced):
+    global _worker_builder
+    template = PlacementBuffer.from_bytes(template)
+    _worker_builder = _GroupBuilder(ctx, template, venue, merge, instanced)
+
+
+def _render_groups(tables):
+    """Pool task: build and format groups, return [(placements, text)]."""
+
+    rendered = []
+    for table in tables:
+        block = RenderedBlock.render(_worker_builder.build(table))
+        rendered.append((block.buffer.to_bytes(), block.text))
+    return rendered
+
+
+def _build_groups_in_pool(builder, tables, workers):
+    """Yield RenderedBlocks for `tables`, in order, built on a process pool."""
+
+    if not tables:
+        return
+
+    chunk_size = max(1, len(tables) // (4 * workers))
+    chunks = [tables[i : i + chunk_size] for i in range(0, len(tables), chunk_size)]
+
+    initargs = (
+        builder.ctx,
+        compile_template(builder.template).to_bytes(),
+        builder.venue,
+        builder.merge,
+        builder.instanced,
+    )
+
+    with ProcessPoolExecutor(
+        workers, initializer=_init_group_worker, initargs=initargs
+    ) as pool:
+        # map() yields chunk results in submission order
+        for rendered in pool.map(_render_groups, chunks):
+            for data, text in rendered:
+                yield RenderedBlock(PlacementBuffer.from_bytes(data), text)
+
+
+def build_groups(
+    ctx, template, venue, merge=False, instanced=False, cache=None, workers=None
+):
+    """
+    Yield one block per venue table (preceded by the "ALL GROUPS" section).
+
+    Group bodies are built once per seat layout and stamped at every table,
+    so the cost grows linearly with the number of tables.
+
+    With a `cache` (block_cache.BlockCache), groups whose inputs did not
+    change are read back from disk instead of being rebuilt.
+
+    With `workers`, groups to build are fanned out to that many processes;
+    they come back serialized and already formatted, and are yielded in
+    table order, so the output does not depend on the number of workers.
+    """
+
+    yield section("ALL GROUPS")
+
+    builder = _GroupBuilder(ctx, template, venue, merge, instanced)
+
+    if not workers:
+        for table in venue.tables:
+            if cache is None:
+                yield builder.build(table)
             else:
-                center_x = c * studs_per_plate
-                center_z = (rows - 1 - r - row_offset) * studs_per_plate
-
-            lines.extend(
-                build_group(
-                    ctx,
-                    template,
-                    str(group_index),
-                    center_x,
-                    center_z,
-                    color,
+                yield cache.get_or_build(
+                    builder.key(table), lambda: builder.build(table)
                 )
-            )
+        return
+
+    if cache is None:
+        yield from _build_groups_in_pool(builder, venue.tables, workers)
+        return
 
-            group_index += 1
+    # Cached groups are read in order; only misses go to the pool
+    keys = [cache.key(builder.key(table)) for table in venue.tables]
+    cached = [cache.get(key) for key in keys]
+    misses = [table for table, block in zip(venue.tables, cached) if block is None]
 
-        if group_index > 10:
-            break
+    cache.hits += len(cached) - len(misses)
+    cache.misses += len(misses)
 
-    return lines
+    built = _build_groups_in_pool(builder, misses, workers)
+
+    for key, block in zip(keys, cached):
+        if block is None:
+            block = next(built)
+            cache.put(key, block)
+        yield block
 
 
 def build_text_on_baseplate(
@@ -189,6 +424,7 @@ def build_text_on_baseplate(
     letter_spacing=1,
     delta_x=0,
     delta_z=0,
+    merge=False,
 ):
     """
     Render text inside a specific baseplate (grid row/col).
@@ -206,15 +442,11 @@ def build_text_on_baseplate(
     base_x = plate_col * studs_per_plate
     base_z = row_from_bottom * studs_per_plate
 
-    # Measure text width in studs
-    total_width = 0
-    for ch in text.upper():
-        if ch not in LETTERS_5x7:
-            raise ValueError(f"Unsupported character: {ch}")
-        total_width += len(LETTERS_5x7[ch][0]) + letter_spacing
-    total_width -= letter_spacing
+    # Measure text width in studs (same cached layout used for rendering)
+    layout = layout_letters(text.upper(), letter_spacing)
+    total_width = layout.width
 
-    text_height = 7
+    text_height = layout.height
 
     if center:
         start_x = base_x + (studs_per_plate - total_width) / 2
@@ -233,100 +465,167 @@ def build_text_on_baseplate(
         start_z,
         color=color,
         letter_spacing=letter_spacing,
+        merge=merge,
     )
 
 
-def main():
-    project_dir = Path(__file__).parent
-    build_dir = project_dir / "build"
-    build_dir.mkdir(parents=True, exist_ok=True)
+def section(title):
+    """Return a block holding only a BOM section marker."""
 
-    # Scene reference plane (kept for backward compatibility).
-    ctx = SceneContext(ground_y=0)
+    block = PlacementBuffer()
+    block.add_section(title)
+    return block
 
-    cols = 3
-    rows = 5
 
-    # ---------------------------------------------------------------------
-    # Build model
-    # ---------------------------------------------------------------------
+def build_scene(
+    ctx, template, venue, merge=False, instanced=False, cache=None, workers=None
+):
+    """
+    Yield the model of a venue (see venue.py) block by block.
+
+    Blocks are written out (and counted in the BOM) as soon as they are
+    produced, so only one block is in memory at a time.
+
+    With `merge`, pixel digits and text use 1xN plates for runs of pixels.
+    With `instanced`, groups reference submodels (see `build_submodels`).
+    With `cache` (block_cache.BlockCache), unchanged groups and text
+    blocks are spliced in from disk.
+    With `workers`, groups are built on a process pool (see `build_groups`).
+    """
+
+    header = PlacementBuffer()
+
+    header.add_comment(venue.name)
+    header.add_comment("Name:  Untitled Model")
+    header.add_comment("Author:  ")
+    header.add_comment("CustomBrick")
+    header.add_comment("FlexibleBrickControlPointUnitLength -1")
+    header.add_comment("FlexibleBrickLockedControlPoint ")
+    header.add_comment()
 
-    lines = [
-        "0 Plateau + digits test",
-        "0 Name:  Untitled Model",
-        "0 Author:  ",
-        "0 CustomBrick",
-        "0 FlexibleBrickControlPointUnitLength -1",
-        "0 FlexibleBrickLockedControlPoint ",
-        "0",
-    ]
+    yield header
 
     # -------------------------
     # BASEPLATES
     # -------------------------
-    add_section(lines, "BASEPLATES")
+    yield section("BASEPLATES")
 
-    lines.extend(build_baseplate_grid(ctx, cols=cols, rows=rows, color=1))
+    yield build_baseplate_grid(
+        ctx, cols=venue.cols, rows=venue.rows, color=venue.baseplate_color
+    )
 
     # -------------------------
     # GROUPS (Digits + Minifigs + Frames)
     # -------------------------
-    add_section(lines, "GROUPS")
-
-    template_path = project_dir / "template" / "minifig.ldr"
-    tpl = load_template(template_path)
-    normalize_template_inplace(tpl)
+    yield section("GROUPS")
 
-    lines.extend(
-        build_groups_grid(
-            ctx,
-            tpl,
-            cols=cols,
-            rows=rows,
-            color=15,
-        )
+    yield from build_groups(
+        ctx,
+        template,
+        venue,
+        merge=merge,
+        instanced=instanced,
+        cache=cache,
+        workers=workers,
     )
 
     # -------------------------
     # TEXT
     # -------------------------
-    add_section(lines, "TEXT - SOPHIE")
+    for block in venue.texts:
+
+        yield section(f"TEXT - {block.text}")
+
+        def build(block=block):
+            return build_text_on_baseplate(
+                ctx,
+                block.text,
+                plate_row=block.plate_row,
+                plate_col=block.plate_col,
+                grid_rows=venue.rows,
+                color=block.color,
+                margin=block.margin,
+                center=block.center,
+                letter_spacing=block.letter_spacing,
+                delta_x=block.delta_x,
+                delta_z=block.delta_z,
+                merge=merge,
+            )
 
-    lines.extend(
-        build_text_on_baseplate(
-            ctx,
-            "SOPHIE",
-            plate_row=0,
-            plate_col=0,
-            grid_rows=rows,
-            center=True,
-            delta_z=-4,
-        )
-    )
+        if cache is None:
+            yield build()
+        else:
+            key = ["text", _context_key(ctx), astuple(block), venue.rows, merge]
+            yield cache.get_or_build(key, build)
 
-    add_section(lines, "TEXT - LAURENT")
 
-    lines.extend(
-        build_text_on_baseplate(
-            ctx,
-            "LAURENT",
-            plate_row=0,
-            plate_col=1,
-            grid_rows=rows,
-            center=True,
-            delta_z=-18,
-        )
-    )
+def main():
+    project_dir = Path(__file__).parent
+    build_dir = project_dir / "build"
+    build_dir.mkdir(parents=True, exist_ok=True)
+
+    # Scene reference plane (kept for backward compatibility).
+    ctx = SceneContext(ground_y=0)
+
+    # Tables, seats and labels of the plan
+    venue = load_venue(project_dir / "venues" / "default.json")
+
+    # Merge pixel runs of digits/text into 1xN plates (fewer parts)
+    merge_plates = False
+
+    # Export groups and minifigs as MPD submodels (one line per instance)
+    mpd = False
+
+    template_path = project_dir / "template" / "minifig.ldr"
+    # Compiled once: placing a minifig then only offsets positions
+    tpl = compile_template(load_normalized_template(template_path, build_dir / "cache"))
+
     # ---------------------------------------------------------------------
-    # Export
+    # Build + export (streamed)
     # ---------------------------------------------------------------------
-    output_path = build_dir / "plateau_digits.ldr"
-    output_path.write_text("\n".join(lines), encoding="utf-8")
+    # Unchanged groups / text blocks are reused from previous runs
+    cache = BlockCache(build_dir / "cache" / "blocks")
+
+    # Build groups on this many worker processes (None: in this process)
+    workers = None
+
+    blocks = build_scene(
+        ctx, tpl, venue, merge_plates, instanced=mpd, cache=cache, workers=workers
+    )
+
+    submodels = build_submodels(ctx, tpl, venue) if mpd else {}
+
+    # Stud occupancy of digits, minifigs, frames and text (overlap report);
+    # submodel references are checked through their content
+    occupancy = OccupancyGrid.for_baseplates(
+        venue.cols, venue.rows, submodels=submodels
+    )
+    blocks = occupancy.track(blocks)
+
+    if mpd:
+        output_path = build_dir / "plateau_digits.mpd"
+        bom = write_ldr(output_path, blocks, submodels=submodels)
+    else:
+        output_path = build_dir / "plateau_digits.ldr"
+        bom = write_ldr(output_path, blocks)
+
     print(f"✅ File generated: {output_path}")
 
-    bom = generate_bom_from_lines(lines)
-    print_bom(bom)
-    print_global_summary(bom)
+    print_overlap_report(occupancy)
+
+    report = build_bom_report(bom)
+    print_bom(report)
+    print_global_summary(report)
+
+    # Machine-readable BOM for the purchasing pipeline
+    write_bom_csv(build_dir / "bom.csv", report)
+    write_bom_json(build_dir / "bom.json", report)
+    unmapped = write_bricklink_xml(build_dir / "bom_wanted_list.xml", report)
+    if unmapped:
+        print(
+            f"⚠️ No BrickLink item id for {', '.join(unmapped)}: "
+            "left out of bom_wanted_list.xml"
+        )
 
 
 if __name__ == "__main__":
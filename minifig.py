@@ -1,32 +1,93 @@
 from context import BASEPLATE_THICKNESS
+from buffer import PlacementBuffer
+from placement import IDENTITY
 
+# Submodel name used when minifigs are exported as MPD instances
+MINIFIG_SUBMODEL = "minifig.ldr"
 
-def build_minifig(ctx, template, stud_x, stud_z):
+
+def compile_template(template):
+    """
+    Compile a normalized template into a PlacementBuffer, once.
+
+    Colors, matrices and part ids are interned in the buffer, so placing
+    the compiled template only has to offset positions (and `lines()`
+    formats the matrix/part suffix once per template part). A buffer is
+    returned unchanged.
+    """
+
+    if isinstance(template, PlacementBuffer):
+        return template
+
+    out = PlacementBuffer()
+
+    for p in template:
+        out.add(
+            p.color,
+            p.x,
+            p.y,
+            p.z,
+            (p.a, p.b, p.c, p.d, p.e, p.f, p.g, p.h, p.i),
+            p.part_id,
+        )
+
+    return out
+
+
+def build_minifig(ctx, template, stud_x, stud_z, matrix=IDENTITY):
     """
     Place a normalized minifig template at the given stud position.
 
     Assumptions:
     - Template is already normalized
     - Template Y=0 corresponds to ground reference
-    - No rotation applied
+    - Template is centered in X/Z: `matrix` rotates it in place
+
+    `template` is ideally compiled once with `compile_template`; a list of
+    template parts is compiled on every call.
+
+    Parameters
+    ----------
+    matrix : tuple
+        3x3 LDraw matrix applied to the whole minifig, e.g.
+        `placement.rotation_y(180)` for a guest facing the other way.
+        It is composed with every template part's matrix in one batch.
     """
 
     dx = ctx.studs(stud_x)
     dz = ctx.studs(stud_z)
     dy = ctx.ground_y - BASEPLATE_THICKNESS  # just snap to plate
 
-    out = []
+    template = compile_template(template)
+    out = PlacementBuffer()
 
-    for p in template:
+    if tuple(matrix) == IDENTITY:
+        out.extend_translated(template, dx, dy, dz)
+    else:
+        out.extend_transformed(template, matrix, dx, dy, dz)
 
-        final_x = p.x + dx
-        final_y = p.y + dy
-        final_z = p.z + dz
+    return ctx.apply(out)
 
-        out.append(
-            f"1 {p.color} {final_x} {final_y} {final_z} "
-            f"{p.a} {p.b} {p.c} {p.d} {p.e} {p.f} {p.g} {p.h} {p.i} "
-            f"{p.part_id}"
-        )
 
-    return out
+def build_minifig_submodel(template):
+    """Return the template itself, as the content of MINIFIG_SUBMODEL."""
+
+    return compile_template(template)
+
+
+def build_minifig_ref(ctx, stud_x, stud_z, submodel=MINIFIG_SUBMODEL, matrix=IDENTITY):
+    """
+    Place a minifig as a single reference to its submodel.
+
+    Same position and orientation as `build_minifig`; the template parts
+    keep their own colors (the reference uses color 16, "main color").
+    """
+
+    dx = ctx.studs(stud_x)
+    dz = ctx.studs(stud_z)
+    dy = ctx.ground_y - BASEPLATE_THICKNESS  # just snap to plate
+
+    out = PlacementBuffer()
+    out.add(16, dx, dy, dz, matrix, submodel)
+
+    return ctx.apply(out)
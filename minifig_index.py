@@ -0,0 +1,302 @@
+"""minifig_index.py
+
+Spatial index of placed minifigs, for seat-assignment queries.
+
+Each placed minifig is reduced to its footprint: the stud bounding box of
+every part `build_minifig` places (part boxes, see occupancy.py, plus the
+origin of each part).
+Footprints are stored in a uniform grid of buckets (`bucket_size` studs);
+an instance is listed in every bucket its box touches. Queries only visit
+the buckets around the query, so they stay sub-millisecond on venues with
+hundreds of thousands of seats:
+
+    index = MinifigIndex.from_venue(ctx, template, venue)
+    index.within_distance((x0, z0, x1, z1), 4)   # seats near an aisle
+    index.overlapping(frame_box)                  # guests hitting a frame
+    index.nearest(x, z, k=3)                      # closest seats to a point
+
+Boxes are (x0, z0, x1, z1) in studs; query results are instance ids, i.e.
+indices into `index.instances`.
+"""
+
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+
+from context import STUD, transform_point
+from minifig import build_minifig
+from occupancy import footprint_rects
+from placement import IDENTITY, rotation_y
+
+
+@dataclass(frozen=True)
+class MinifigInstance:
+    """One placed minifig."""
+
+    table: str
+    seat: int
+    x: float  # stud position given to build_minifig
+    z: float
+    bbox: tuple  # (x0, z0, x1, z1) in studs
+    facing: float = 0.0  # degrees about Y (see venue.py)
+
+
+def minifig_footprint(block):
+    """
+    Stud bounding box (x0, z0, x1, z1) of a minifig block.
+
+    Covers the box of every part with a known extent (`occupancy.part_box`,
+    minifig body parts included) and the origin of every part, so parts
+    without a box still count.
+    """
+
+    positions = np.frombuffer(block.positions, dtype=np.float64).reshape(-1, 3)
+    if not len(positions):
+        raise ValueError("Empty minifig block")
+
+    _, (x0, x1, z0, z1) = footprint_rects(block)
+    x = np.concatenate((positions[:, 0] / STUD, x0, x1))
+    z = np.concatenate((positions[:, 2] / STUD, z0, z1))
+    return (float(x.min()), float(z.min()), float(x.max()), float(z.max()))
+
+
+def box_distance(a, b):
+    """Euclidean distance between two boxes (0 if they touch or overlap)."""
+
+    dx = max(a[0] - b[2], b[0] - a[2], 0)
+    dz = max(a[1] - b[3], b[1] - a[3], 0)
+    return math.hypot(dx, dz)
+
+
+def _overlap(a, b):
+    """True if the boxes share some area (touching edges do not count)."""
+
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class MinifigIndex:
+    """Grid-bucket index over minifig footprints."""
+
+    def __init__(self, bucket_size=8):
+        self.bucket_size = bucket_size
+        self.instances = []
+        self._buckets = defaultdict(list)
+        # Bucket range holding instances (bounds the nearest-neighbour search)
+        self._extent = None
+
+    def __len__(self):
+        return len(self.instances)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def _bucket_range(self, bbox):
+        size = self.bucket_size
+        return (
+            math.floor(bbox[0] / size),
+            math.floor(bbox[1] / size),
+            math.floor(bbox[2] / size),
+            math.floor(bbox[3] / size),
+        )
+
+    def add(self, instance):
+        """Insert a MinifigInstance; return its id."""
+
+        index = len(self.instances)
+        self.instances.append(instance)
+
+        bx0, bz0, bx1, bz1 = self._bucket_range(instance.bbox)
+        for bx in range(bx0, bx1 + 1):
+            for bz in range(bz0, bz1 + 1):
+                self._buckets[(bx, bz)].append(index)
+
+        if self._extent is None:
+            self._extent = [bx0, bz0, bx1, bz1]
+        else:
+            extent = self._extent
+            extent[0] = min(extent[0], bx0)
+            extent[1] = min(extent[1], bz0)
+            extent[2] = max(extent[2], bx1)
+            extent[3] = max(extent[3], bz1)
+
+        return index
+
+    def add_block(self, block, table="", seat=0, x=None, z=None):
+        """
+        Insert a minifig from the placements `build_minifig` produced.
+
+        `x` / `z` default to the center of its footprint.
+        """
+
+        bbox = minifig_footprint(block)
+        if x is None:
+            x = (bbox[0] + bbox[2]) / 2
+        if z is None:
+            z = (bbox[1] + bbox[3]) / 2
+        return self.add(MinifigInstance(table, seat, x, z, bbox))
+
+    @classmethod
+    def from_venue(cls, ctx, template, venue, bucket_size=8):
+        """
+        Index every seat of `venue` (see venue.py), as main.build_scene
+        places them under `ctx`.
+
+        The template footprint is measured once per seat facing on a
+        `build_minifig` block and then moved to each seat (and through the
+        ctx transform).
+        """
+
+        footprints = {}
+        matrix, offset = ctx.transform
+        index = cls(bucket_size)
+
+        for table in venue.tables:
+            for seat, (dx, dz, facing) in enumerate(venue.seats(table)):
+                local = footprints.get(facing)
+                if local is None:
+                    rotation = rotation_y(facing) if facing else IDENTITY
+                    with ctx.local():
+                        block = build_minifig(ctx, template, 0, 0, matrix=rotation)
+                    local = footprints[facing] = minifig_footprint(block)
+
+                x = table.x + dx
+                z = table.z + dz
+                bbox = (local[0] + x, local[1] + z, local[2] + x, local[3] + z)
+
+                if not ctx.is_identity:
+                    x, z, bbox = _transform(matrix, offset, x, z, bbox)
+
+                index.add(MinifigInstance(table.label, seat, x, z, bbox, facing))
+
+        return index
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _candidates(self, bbox):
+        bx0, bz0, bx1, bz1 = self._bucket_range(bbox)
+        seen = set()
+        buckets = self._buckets
+
+        for bx in range(bx0, bx1 + 1):
+            for bz in range(bz0, bz1 + 1):
+                seen.update(buckets.get((bx, bz), ()))
+
+        return seen
+
+    def overlapping(self, bbox):
+        """Ids of minifigs whose footprint overlaps `bbox` (e.g. a frame bar)."""
+
+        return sorted(
+            i for i in self._candidates(bbox) if _overlap(self.instances[i].bbox, bbox)
+        )
+
+    def within_distance(self, bbox, distance):
+        """Ids of minifigs whose footprint is at most `distance` studs from `bbox`."""
+
+        search = (
+            bbox[0] - distance,
+            bbox[1] - distance,
+            bbox[2] + distance,
+            bbox[3] + distance,
+        )
+        return sorted(
+            i
+            for i in self._candidates(search)
+            if box_distance(self.instances[i].bbox, bbox) <= distance
+        )
+
+    def nearest(self, x, z, k=1):
+        """
+        The `k` minifigs closest to the stud point (x, z), as
+        [(distance, id)] sorted by distance (footprint distance, 0 inside).
+        """
+
+        if not self.instances or k <= 0:
+            return []
+
+        size = self.bucket_size
+        point = (x, z, x, z)
+        cx = math.floor(x / size)
+        cz = math.floor(z / size)
+
+        # Rings needed to reach every bucket holding an instance
+        bx0, bz0, bx1, bz1 = self._extent
+        max_ring = max(cx - bx0, bx1 - cx, cz - bz0, bz1 - cz, 0)
+
+        best = {}
+        ring = 0
+
+        while True:
+            for bx, bz in _ring(cx, cz, ring):
+                for i in self._buckets.get((bx, bz), ()):
+                    if i not in best:
+                        best[i] = box_distance(self.instances[i].bbox, point)
+
+            found = sorted((d, i) for i, d in best.items())[:k]
+
+            # Unvisited buckets are at least `ring * size` studs away
+            if (len(found) == k and found[-1][0] <= ring * size) or ring >= max_ring:
+                return found
+
+            ring += 1
+
+    def collisions(self, occupancy, layer):
+        """
+        Ids of minifigs whose footprint covers an occupied cell of `layer`
+        in an occupancy.OccupancyGrid (e.g. layer "frame").
+        """
+
+        grid = occupancy.layers.get(layer)
+        if grid is None:
+            return []
+
+        r = occupancy.cells_per_stud
+        rows, cols = grid.shape
+        hits = []
+
+        for i, instance in enumerate(self.instances):
+            x0, z0, x1, z1 = instance.bbox
+            c0 = max(math.floor((x0 - occupancy.min_x) * r + 1e-6), 0)
+            c1 = min(math.ceil((x1 - occupancy.min_x) * r - 1e-6), cols)
+            r0 = max(math.floor((z0 - occupancy.min_z) * r + 1e-6), 0)
+            r1 = min(math.ceil((z1 - occupancy.min_z) * r - 1e-6), rows)
+
+            if c0 < c1 and r0 < r1 and grid[r0:r1, c0:c1].any():
+                hits.append(i)
+
+        return hits
+
+
+def _ring(cx, cz, ring):
+    """Bucket coordinates at Chebyshev distance `ring` from (cx, cz)."""
+
+    if ring == 0:
+        yield cx, cz
+        return
+
+    for bx in range(cx - ring, cx + ring + 1):
+        yield bx, cz - ring
+        yield bx, cz + ring
+    for bz in range(cz - ring + 1, cz + ring):
+        yield cx - ring, bz
+        yield cx + ring, bz
+
+
+def _transform(matrix, offset, x, z, bbox):
+    """Move a stud point and box through a ctx transform (offset in LDU)."""
+
+    corners = [
+        transform_point(matrix, offset, cx * STUD, 0, cz * STUD)
+        for cx in (bbox[0], bbox[2])
+        for cz in (bbox[1], bbox[3])
+    ]
+    xs = [c[0] / STUD for c in corners]
+    zs = [c[2] / STUD for c in corners]
+
+    px, _, pz = transform_point(matrix, offset, x * STUD, 0, z * STUD)
+    return px / STUD, pz / STUD, (min(xs), min(zs), max(xs), max(zs))
@@ -0,0 +1,591 @@
+"""occupancy.py
+
+Stud-level occupancy of the baseplate grid, with an overlap report.
+
+Every layer (digits, minifigs, frame, text) is a NumPy boolean array over
+the baseplate grid. Parts are marked from their footprint: a local bounding
+box (catalog size for plates, bricks and tiles, PART_BOXES for minifig and
+other parts) turned by their matrix and projected on the baseplate. Parts
+without a box (baseplates, submodel references, unknown parts) are not
+marked.
+
+Marks come from the scene stream itself, like the BOM: `OccupancyGrid.track`
+wraps the blocks written by `export.write_ldr` and reads the markers the
+builders already emit:
+
+    0 ===== TEXT - ... =====     -> layer "text"
+    0 -- Digit N --              -> layer "digits"
+    0 -- Minifigures --          -> layer "minifigs"
+    0 -- Seat N --               -> layer "minifigs" (one per guest)
+    0 -- Frame --                -> layer "frame"
+
+so stamped, cached and pool-built blocks are covered alike. Each marked
+range is one object: parts stacked inside it are not overlaps; any cell an
+object shares with an earlier object (same layer or not) is reported.
+Every seated minifig is its own range, so guests of one group are checked
+against each other.
+
+In instanced (MPD) scenes, references to `submodels` are expanded at their
+transform before marking, like the hierarchical BOM expands them: a group
+reference brings its own "-- Minifigures --" / "-- Frame --" markers.
+References to submodels the grid was not given are counted in `unchecked`
+and reported, never silently passed as clean.
+
+Coordinates
+-----------
+Frames sit on half studs (their bars are centered on x = center +- 15.5),
+digits and text on whole studs, so the grid defaults to 2 cells per stud.
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+from bom import MINIFIG_HEAD_PREFIX, part_info
+from buffer import PlacementBuffer
+from context import STUD
+from export import RenderedBlock
+from placement import Comment
+
+# Footprints (width, length) of parts the catalogs do not size
+EXTRA_FOOTPRINTS = {
+    "2431": (1, 4),  # tile 1x4 with bar
+}
+
+# Local bounding boxes (x0, x1, y0, y1, z0, z1) in LDU of parts without a
+# catalog size. Minifig parts are approximate outer bounds: +Y runs down
+# the body from each part's origin, the face looks towards -Z; legs and
+# arms use the union of both sides.
+PART_BOXES = {
+    MINIFIG_HEAD_PREFIX: (-12, 12, -4, 24, -12, 12),  # head, any print
+    "973": (-20, 20, 0, 32, -10, 10),  # torso
+    "3815": (-20, 20, 0, 12, -10, 10),  # hips
+    "3816": (-20, 20, 0, 28, -14, 10),  # leg
+    "3817": (-20, 20, 0, 28, -14, 10),  # leg
+    "3818": (-8, 8, -4, 20, -14, 8),  # arm
+    "3819": (-8, 8, -4, 20, -14, 8),  # arm
+    "3820": (-6, 6, -6, 10, -8, 6),  # hand
+    "87609": (-20, 20, 0, 8, -20, 20),  # tile 2x2 with studs on edge
+    "30414": (-40, 40, 0, 24, -10, 10),  # brick 1x4 with studs on side
+}
+
+# Comment prefix -> layer (None: not marked)
+LAYER_COMMENTS = (
+    ("-- Digit", "digits"),
+    ("-- Minifigures + Frame", None),  # group reference: its content is marked
+    ("-- Minifigures", "minifigs"),
+    ("-- Seat", "minifigs"),
+    ("-- Frame", "frame"),
+)
+
+# Section title prefix -> layer
+LAYER_SECTIONS = (("TEXT", "text"),)
+
+# Float tolerance when snapping part edges to cells
+_EDGE_EPSILON = 1e-6
+
+# Part ids ending like this are submodel references, not parts
+SUBMODEL_SUFFIXES = (".ldr", ".mpd")
+
+
+@lru_cache(maxsize=None)
+def part_footprint(part_id):
+    """(width, length) in studs of a part, or None if it has no footprint."""
+
+    size = EXTRA_FOOTPRINTS.get(part_id.replace(".dat", ""))
+    if size is not None:
+        return size
+
+    try:
+        category, width, length = part_info(part_id)
+    except ValueError:
+        # Submodel references and unknown parts
+        return None
+
+    if category == "PLATE_32x32" or width is None:
+        return None
+    return width, length
+
+
+@lru_cache(maxsize=None)
+def part_box(part_id):
+    """
+    Local bounding box (x0, x1, y0, y1, z0, z1) in LDU of a part, or None.
+
+    Catalog parts are their footprint centered on the origin (flat: the
+    height does not matter on the baseplate); other parts come from
+    PART_BOXES.
+    """
+
+    size = part_footprint(part_id)
+    if size is not None:
+        width, length = size
+        return (-length * STUD / 2, length * STUD / 2, 0, 0, -width * STUD / 2, width * STUD / 2)
+
+    part = part_id.replace(".dat", "")
+    if part.startswith(MINIFIG_HEAD_PREFIX):
+        part = MINIFIG_HEAD_PREFIX
+    return PART_BOXES.get(part)
+
+
+def footprint_rects(buffer, mask=None):
+    """
+    Stud rectangles covered by the placements of `buffer`.
+
+    Parameters
+    ----------
+    mask : ndarray, optional
+        Boolean per placement; only these placements are considered.
+
+    Returns
+    -------
+    (selected, (x0, x1, z0, z1))
+        `selected` is the boolean mask of placements with a footprint; the
+        four arrays give their rectangles (stud coordinates) in order.
+    """
+
+    boxes = [part_box(p) for p in buffer.part_ids]
+    known = np.array([box is not None for box in boxes], dtype=bool)
+    boxes = np.array([box or (0,) * 6 for box in boxes], dtype=np.float64)
+    boxes = boxes.reshape(-1, 6)
+    part_index = np.frombuffer(buffer.part_index, dtype=np.uint32)
+
+    selected = known[part_index]
+    if mask is not None:
+        selected &= mask
+
+    box = boxes[part_index[selected]]
+    center = (box[:, 0::2] + box[:, 1::2]) / 2  # local x, y, z
+    half = (box[:, 1::2] - box[:, 0::2]) / 2
+
+    matrices = np.asarray(buffer.matrices, dtype=np.float64).reshape(-1, 3, 3)
+    m = matrices[np.frombuffer(buffer.matrix_index, dtype=np.uint32)[selected]]
+
+    # World X / Z rows of the matrix: box center and half extents
+    center_x = np.einsum("nj,nj->n", m[:, 0], center)
+    center_z = np.einsum("nj,nj->n", m[:, 2], center)
+    half_x = np.einsum("nj,nj->n", np.abs(m[:, 0]), half) / STUD
+    half_z = np.einsum("nj,nj->n", np.abs(m[:, 2]), half) / STUD
+
+    positions = np.frombuffer(buffer.positions, dtype=np.float64).reshape(-1, 3)
+    center_x = (positions[selected, 0] + center_x) / STUD
+    center_z = (positions[selected, 2] + center_z) / STUD
+
+    return selected, (
+        center_x - half_x,
+        center_x + half_x,
+        center_z - half_z,
+        center_z + half_z,
+    )
+
+
+@dataclass(frozen=True)
+class Overlap:
+    """Cells a marked object shares with earlier objects of `other_layer`."""
+
+    label: str
+    layer: str
+    other_layer: str
+    cells: int
+    bbox: tuple  # (x0, z0, x1, z1) in studs
+
+
+@dataclass
+class OccupancyGrid:
+    """
+    Per-layer boolean occupancy over a rectangle of the stud grid.
+
+    Parts are reduced to cell rectangles as blocks arrive; rectangles are
+    expanded to cells and checked for overlaps in large vectorized batches
+    (`flush`), so marking costs a few array operations per block, not per
+    stud. `overlaps` and the layers are complete after `flush` (called by
+    `track` at the end of the stream).
+
+    Parameters
+    ----------
+    min_x, min_z : float
+        Stud coordinates of the grid corner (cell edges, not stud centers).
+    width, depth : int
+        Size in studs along X and Z.
+    cells_per_stud : int
+        Grid resolution (2: half-stud cells).
+    submodels : dict
+        {name: PlacementBuffer} of an instanced scene; references to them
+        are expanded at their transform.
+    """
+
+    min_x: float
+    min_z: float
+    width: int
+    depth: int
+    cells_per_stud: int = 2
+    layers: dict = field(default_factory=dict)
+    overlaps: list = field(default_factory=list)
+    outside: int = 0  # marked cells falling outside the grid
+    submodels: dict = field(default_factory=dict)
+    unchecked: int = 0  # references to unknown submodels (not marked)
+
+    # Stream state (see `track`)
+    _section: str = field(default="UNDEFINED", init=False, repr=False)
+    _layer: str = field(default=None, init=False, repr=False)
+
+    # Pending objects: (layer, label) and their rectangles (see `flush`)
+    _objects: list = field(default_factory=list, init=False, repr=False)
+    _rects: list = field(default_factory=list, init=False, repr=False)
+    _pending_cells: int = field(default=0, init=False, repr=False)
+
+    # Submodels with their own references expanded, in local space
+    _flat_submodels: dict = field(default_factory=dict, init=False, repr=False)
+
+    # Flush once this many cells are pending
+    batch_cells = 1 << 22
+
+    @classmethod
+    def for_baseplates(
+        cls, cols, rows, studs_per_plate=32, cells_per_stud=2, submodels=None
+    ):
+        """Grid covering `baseplate.build_baseplate_grid(ctx, cols, rows)`."""
+
+        half = studs_per_plate / 2
+        return cls(
+            -half,
+            -half,
+            cols * studs_per_plate,
+            rows * studs_per_plate,
+            cells_per_stud,
+            submodels=dict(submodels or {}),
+        )
+
+    @property
+    def shape(self):
+        """(cells along Z, cells along X)."""
+
+        return (self.depth * self.cells_per_stud, self.width * self.cells_per_stud)
+
+    def layer(self, name):
+        grid = self.layers.get(name)
+        if grid is None:
+            grid = np.zeros(self.shape, dtype=bool)
+            self.layers[name] = grid
+        return grid
+
+    # ------------------------------------------------------------------
+    # Marking
+    # ------------------------------------------------------------------
+
+    def mark(self, layer, buffer, label="", start=0, stop=None):
+        """
+        Mark placements [start, stop) of `buffer` as one object of `layer`.
+
+        Cells already used by earlier objects are recorded in `overlaps`.
+        """
+
+        stop = len(buffer) if stop is None else stop
+        self._queue(buffer, [(layer, label, start, stop)])
+        self.flush()
+
+    def _queue(self, buffer, objects):
+        """Queue the part rectangles of (layer, label, start, stop) objects."""
+
+        first = len(self._objects)
+        owners = np.full(len(buffer), -1, dtype=np.int64)
+        for number, (layer, label, start, stop) in enumerate(objects):
+            self._objects.append((layer, label))
+            owners[start:stop] = first + number
+
+        selected, (x0, x1, z0, z1) = footprint_rects(buffer, owners >= 0)
+        if not selected.any():
+            return
+
+        r = self.cells_per_stud
+        rect = np.empty((len(x0), 5), dtype=np.int64)
+        rect[:, 0] = owners[selected]
+        rect[:, 1] = np.floor((x0 - self.min_x) * r + _EDGE_EPSILON)
+        rect[:, 2] = np.ceil((x1 - self.min_x) * r - _EDGE_EPSILON)
+        rect[:, 3] = np.floor((z0 - self.min_z) * r + _EDGE_EPSILON)
+        rect[:, 4] = np.ceil((z1 - self.min_z) * r - _EDGE_EPSILON)
+
+        self._rects.append(rect)
+        self._pending_cells += int(
+            ((rect[:, 2] - rect[:, 1]) * (rect[:, 4] - rect[:, 3])).sum()
+        )
+
+        if self._pending_cells >= self.batch_cells:
+            self.flush()
+
+    def _expand(self, rects):
+        """(owner, flat cell) pairs of rectangles, sorted by cell then owner."""
+
+        rows, cols = self.shape
+        span_x = rects[:, 2] - rects[:, 1]
+        span_z = rects[:, 4] - rects[:, 3]
+        shapes = span_z * (span_x.max() + 1) + span_x
+
+        owners = []
+        cells = []
+
+        # Rectangles of the same shape expand with one broadcast
+        for shape in np.unique(shapes):
+            same = rects[shapes == shape]
+            dz = int(span_z[shapes == shape][0])
+            dx = int(span_x[shapes == shape][0])
+            oz = np.repeat(np.arange(dz), dx)
+            ox = np.tile(np.arange(dx), dz)
+
+            cz = (same[:, 3, None] + oz).reshape(-1)
+            cx = (same[:, 1, None] + ox).reshape(-1)
+
+            inside = (cz >= 0) & (cz < rows) & (cx >= 0) & (cx < cols)
+            self.outside += int(np.count_nonzero(~inside))
+            owners.append(np.repeat(same[:, 0], dz * dx)[inside])
+            cells.append(cz[inside] * cols + cx[inside])
+
+        owners = np.concatenate(owners)
+        cells = np.concatenate(cells)
+
+        # Unique (cell, owner): stacked parts of one object count once
+        keys = cells * len(self._objects) + owners
+        keys.sort()
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        cells, owners = np.divmod(keys, len(self._objects))
+        return owners, cells
+
+    def flush(self):
+        """
+        Expand pending rectangles and record overlaps, in object order.
+
+        A cell of object k overlaps layer L when L already held the cell
+        before this batch, or an earlier object of this batch (id < k) of
+        layer L covers it.
+        """
+
+        objects = self._objects
+        rects = self._rects
+        self._rects = []
+        self._pending_cells = 0
+
+        if not rects:
+            return
+
+        owners, cells = self._expand(np.concatenate(rects))
+
+        names = list(dict.fromkeys([layer for layer, _ in objects] + list(self.layers)))
+        layer_ids = np.array([names.index(layer) for layer, _ in objects])
+        pair_layer = layer_ids[owners]
+
+        # Pairs are sorted by cell, then owner: index of each cell run start
+        new_cell = np.ones(len(cells), dtype=bool)
+        new_cell[1:] = cells[1:] != cells[:-1]
+        run_start = np.maximum.accumulate(np.where(new_cell, np.arange(len(cells)), 0))
+
+        hit_owner = []
+        hit_layer = []
+        hit_cell = []
+
+        for number, name in enumerate(names):
+            is_layer = pair_layer == number
+
+            # Earlier pairs of this layer in the same cell (owner order)
+            counts = np.cumsum(is_layer) - is_layer
+            earlier = counts - counts[run_start]
+
+            hits = earlier > 0
+            grid = self.layers.get(name)
+            if grid is not None:
+                hits |= grid.reshape(-1)[cells]
+
+            hit_owner.append(owners[hits])
+            hit_layer.append(np.full(np.count_nonzero(hits), number))
+            hit_cell.append(cells[hits])
+
+        for number, name in enumerate(names):
+            self.layer(name).reshape(-1)[cells[pair_layer == number]] = True
+
+        self._record(
+            names,
+            np.concatenate(hit_owner),
+            np.concatenate(hit_layer),
+            np.concatenate(hit_cell),
+        )
+
+    def _record(self, names, owners, layers, cells):
+        """Append one Overlap per (object, other layer), in object order."""
+
+        if not len(cells):
+            return
+
+        order = np.lexsort((layers, owners))
+        owners, layers, cells = owners[order], layers[order], cells[order]
+
+        starts = np.flatnonzero(
+            np.concatenate(
+                ([True], (owners[1:] != owners[:-1]) | (layers[1:] != layers[:-1]))
+            )
+        )
+        counts = np.diff(np.append(starts, len(cells)))
+
+        cols = self.shape[1]
+        r = self.cells_per_stud
+        z, x = np.divmod(cells, cols)
+        x0 = np.minimum.reduceat(x, starts)
+        x1 = np.maximum.reduceat(x, starts) + 1
+        z0 = np.minimum.reduceat(z, starts)
+        z1 = np.maximum.reduceat(z, starts) + 1
+
+        for i, start in enumerate(starts):
+            layer, label = self._objects[owners[start]]
+            self.overlaps.append(
+                Overlap(
+                    label,
+                    layer,
+                    names[layers[start]],
+                    int(counts[i]),
+                    (
+                        float(self.min_x + x0[i] / r),
+                        float(self.min_z + z0[i] / r),
+                        float(self.min_x + x1[i] / r),
+                        float(self.min_z + z1[i] / r),
+                    ),
+                )
+            )
+
+    # ------------------------------------------------------------------
+    # Scene stream
+    # ------------------------------------------------------------------
+
+    def add(self, block):
+        """Queue one scene block (PlacementBuffer, RenderedBlock or records)."""
+
+        if isinstance(block, RenderedBlock):
+            block = block.buffer
+        elif not isinstance(block, PlacementBuffer):
+            records = block
+            block = PlacementBuffer()
+            block.extend(records)
+
+        block = self._expand_references(block)
+
+        objects = []
+        start = 0
+
+        for pos, text in block.comments:
+            self._collect(objects, start, pos)
+            self._enter(text)
+            start = pos
+
+        self._collect(objects, start, len(block))
+
+        if objects:
+            self._queue(block, objects)
+
+    def track(self, blocks):
+        """Yield `blocks` unchanged, marking each one on the way."""
+
+        for block in blocks:
+            self.add(block)
+            yield block
+
+        self.flush()
+
+    def _expand_references(self, block, _stack=()):
+        """
+        `block` with submodel references replaced by the submodel content,
+        transformed like the reference (comments included).
+        """
+
+        if not any(p.lower().endswith(SUBMODEL_SUFFIXES) for p in block.part_ids):
+            return block
+
+        expanded = PlacementBuffer()
+
+        for item in block:
+            if isinstance(item, Comment):
+                expanded.add_comment(item.text)
+            elif item.part_id in self.submodels:
+                expanded.extend_transformed(
+                    self._flat_submodel(item.part_id, _stack),
+                    item.matrix,
+                    item.x,
+                    item.y,
+                    item.z,
+                )
+            elif item.part_id.lower().endswith(SUBMODEL_SUFFIXES):
+                self.unchecked += 1
+            else:
+                expanded.add_placement(item)
+
+        return expanded
+
+    def _flat_submodel(self, name, _stack=()):
+        flat = self._flat_submodels.get(name)
+        if flat is not None:
+            return flat
+
+        if name in _stack:
+            raise ValueError(f"Recursive submodel reference: {name}")
+
+        flat = self._expand_references(self.submodels[name], _stack + (name,))
+        self._flat_submodels[name] = flat
+        return flat
+
+    def _enter(self, text):
+        section = Comment(text).section
+        if section is not None:
+            self._section = section
+            self._layer = next(
+                (layer for prefix, layer in LAYER_SECTIONS if section.startswith(prefix)),
+                None,
+            )
+            return
+
+        for prefix, layer in LAYER_COMMENTS:
+            if text.startswith(prefix):
+                self._layer = layer
+                return
+
+    def _collect(self, objects, start, stop):
+        if self._layer is not None and stop > start:
+            objects.append((self._layer, self._section, start, stop))
+
+    # ------------------------------------------------------------------
+    # Report
+    # ------------------------------------------------------------------
+
+    def overlap_matrix(self):
+        """{(layer, other_layer): overlapping cells}, summed over objects."""
+
+        totals = {}
+        for overlap in self.overlaps:
+            key = (overlap.layer, overlap.other_layer)
+            totals[key] = totals.get(key, 0) + overlap.cells
+        return totals
+
+
+def print_overlap_report(grid):
+    """Print the overlaps found while marking `grid`."""
+
+    print("\n===== OCCUPANCY =====\n")
+
+    if grid.unchecked:
+        print(
+            f"⚠️ {grid.unchecked} submodel references not checked "
+            "(submodels not given to the grid)"
+        )
+
+    if not grid.overlaps and not grid.outside:
+        print("No overlaps in checked parts\n" if grid.unchecked else "No overlaps\n")
+        return
+
+    r = grid.cells_per_stud
+    for o in grid.overlaps:
+        x0, z0, x1, z1 = o.bbox
+        print(
+            f"{o.label:16} {o.layer:>8} / {o.other_layer:<8} "
+            f"{o.cells / r / r:g} studs  x {x0:g}..{x1:g}  z {z0:g}..{z1:g}"
+        )
+
+    if grid.outside:
+        print(f"Outside the baseplates: {grid.outside / r / r:g} studs")
+
+    print()
@@ -0,0 +1,96 @@
+"""placement.py
+
+Typed scene records shared by every builder.
+
+Builders emit `Placement` records (LDraw type-1 lines) and `Comment` records
+(LDraw type-0 meta lines). The BOM and the exporter read these records
+directly; LDraw text is only produced at export time.
+"""
+
+import math
+from dataclasses import dataclass
+
+from colors import DIRECT_COLOR_MIN
+
+# 3x3 orientation matrices, row-major (a b c d e f g h i)
+IDENTITY = (1, 0, 0, 0, 1, 0, 0, 0, 1)
+ROTATE_Y_90 = (0, 0, 1, 0, 1, 0, -1, 0, 0)
+
+
+def rotation_y(degrees):
+    """Rotation about the Y axis, as an LDraw matrix (same sense as ROTATE_Y_90).
+
+    Values are rounded to 12 decimals so quarter turns are exact.
+    """
+
+    radians = math.radians(degrees)
+    cos = round(math.cos(radians), 12) + 0.0
+    sin = round(math.sin(radians), 12) + 0.0
+    return (cos, 0, sin, 0, 1, 0, -sin + 0.0, 0, cos)
+
+
+def format_number(value):
+    """Format a coordinate or matrix value for an LDraw line.
+
+    Integral values are written without decimals, other values with at most
+    6 decimals (trailing zeros removed).
+    """
+
+    if float(value).is_integer():
+        return str(int(value))
+
+    text = f"{value:.6f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def format_color(code):
+    """Format a color code for an LDraw line (direct colors in hex)."""
+
+    if code >= DIRECT_COLOR_MIN:
+        return f"0x{code:X}"
+    return str(code)
+
+
+@dataclass(frozen=True)
+class Placement:
+    """One part placement (LDraw type-1 line)."""
+
+    color: int
+    x: float
+    y: float
+    z: float
+    matrix: tuple
+    part_id: str
+
+    def to_line(self):
+        numbers = (self.x, self.y, self.z) + tuple(self.matrix)
+        values = " ".join(format_number(v) for v in numbers)
+        return f"1 {format_color(self.color)} {values} {self.part_id}"
+
+
+@dataclass(frozen=True)
+class Comment:
+    """One LDraw meta line (type-0). An empty text gives a bare "0" line."""
+
+    text: str = ""
+
+    @property
+    def section(self):
+        """Section title if this comment is a section marker, else None.
+
+        Sections are defined by:
+            0 ===== SECTION NAME =====
+        """
+
+        if not self.text.startswith("====="):
+            return None
+        return self.text.replace("=====", "").strip()
+
+    def to_line(self):
+        return f"0 {self.text}" if self.text else "0"
+
+
+def section_marker(title):
+    """Return the three comment lines that open a BOM section."""
+
+    return [Comment(), Comment(f"===== {title} ====="), Comment()]
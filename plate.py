@@ -1,24 +1,5 @@
-PLATES = {
-    1: {
-        1: "3024.dat",  # Plate 1 x 1
-        2: "3023.dat",  # Plate 1 x 2
-        3: "3623.dat",  # Plate 1 x 3
-        4: "3710.dat",  # Plate 1 x 4
-        6: "3666.dat",  # Plate 1 x 6
-        8: "3460.dat",  # Plate 1 x 8
-        10: "4477.dat",  # Plate 1 x 10
-        12: "60479.dat",  # Plate 1 x 12
-    },
-    2: {
-        2: "3022.dat",  # Plate 2 x 2
-        3: "3021.dat",  # Plate 2 x 3
-        4: "3020.dat",  # Plate 2 x 4
-        6: "3795.dat",  # Plate 2 x 6
-        8: "3034.dat",  # Plate 2 x 8
-        10: "3832.dat",  # Plate 2 x 10
-        12: "2445.dat",  # Plate 2 x 12
-    },
-}
+from catalog import PLATE_CATEGORIES, PLATES, catalog_size
+from placement import IDENTITY, ROTATE_Y_90, Placement
 
 
 def get_plate_size(part_id):
@@ -27,14 +8,7 @@ def get_plate_size(part_id):
     Returns None if not found.
     """
 
-    part = part_id.replace(".dat", "")
-
-    for width, length_dict in PLATES.items():
-        for length, ref in length_dict.items():
-            if part == ref.replace(".dat", ""):
-                return (width, length)
-
-    return None
+    return catalog_size(part_id, PLATE_CATEGORIES)
 
 
 def build_plate(ctx, stud_x, stud_z, color, length):
@@ -43,7 +17,7 @@ def build_plate(ctx, stud_x, stud_z, color, length):
     y = ctx.baseplate_top_origin_y
     part = PLATES[1][length]
 
-    return f"1 {color} {x:.6f} {y:.6f} {z:.6f} 1 0 0 0 1 0 0 0 1 {part}"
+    return ctx.apply_placement(Placement(color, x, y, z, IDENTITY, part))
 
 
 def build_plate_rotated(ctx, stud_x, stud_z, color, length):
@@ -53,4 +27,4 @@ def build_plate_rotated(ctx, stud_x, stud_z, color, length):
     part = PLATES[1][length]
 
     # rotate 90° around Y
-    return f"1 {color} {x:.6f} {y:.6f} {z:.6f} 0 0 1 0 1 0 -1 0 0 {part}"
+    return ctx.apply_placement(Placement(color, x, y, z, ROTATE_Y_90, part))
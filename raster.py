@@ -0,0 +1,180 @@
+"""raster.py
+
+Vectorized bitmap-to-placements rasterizer.
+
+Digits (digits.py) and letters (text.py) are 5x7 "pixel" patterns where each
+'#' becomes a 1x1 plate on a stud. Patterns are compiled once into `Glyph`
+objects holding the (col, row) offsets of their filled pixels. A string is
+laid out by shifting glyph offsets along X, and all stud coordinates of a
+string are produced with a single NumPy operation.
+
+Coordinate conventions
+----------------------
+Row 0 is the TOP of the rendered text. Placing a layout at
+(left_stud_x, top_stud_z) gives, for a filled pixel (col, row):
+
+    stud_x = left_stud_x + col
+    stud_z = top_stud_z - row
+
+i.e. increasing rows move towards smaller Z, like the builders always did.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from buffer import PlacementBuffer
+from catalog import PLATES
+from placement import IDENTITY, ROTATE_Y_90
+from tiling import greedy_runs
+
+PLATE_1x1 = "3024.dat"
+
+
+def _frozen(values):
+    values = np.asarray(values, dtype=np.int64)
+    values.flags.writeable = False
+    return values
+
+
+@dataclass(frozen=True, eq=False)
+class Glyph:
+    """Compiled pattern: size and (col, row) offsets of filled pixels."""
+
+    width: int
+    height: int
+    cols: np.ndarray
+    rows: np.ndarray
+
+
+@dataclass(frozen=True, eq=False)
+class TextLayout:
+    """A laid-out string: overall size and offsets of every filled pixel."""
+
+    width: int
+    height: int
+    cols: np.ndarray
+    rows: np.ndarray
+
+    def mask(self):
+        """Boolean mask (rows x columns) of the layout."""
+
+        mask = np.zeros((self.height, self.width), dtype=bool)
+        mask[self.rows, self.cols] = True
+        return mask
+
+
+def compile_glyph(bitmap):
+    """Compile a pattern (list of strings, '#' = filled) into a Glyph."""
+
+    height = len(bitmap)
+    width = len(bitmap[0])
+    raw = np.frombuffer("".join(bitmap).encode("ascii"), dtype=np.uint8)
+    rows, cols = np.nonzero(raw.reshape(height, width) == ord("#"))
+    return Glyph(width, height, _frozen(cols), _frozen(rows))
+
+
+def compile_glyphs(patterns):
+    """Compile a {char: pattern} table into a {char: Glyph} table."""
+
+    return {ch: compile_glyph(bitmap) for ch, bitmap in patterns.items()}
+
+
+def layout_glyphs(glyphs, text, spacing=1):
+    """
+    Lay out `text` left to right with `spacing` empty columns between glyphs.
+
+    Callers wrap this in an LRU cache keyed by (text, spacing), so the
+    returned arrays are read-only.
+    """
+
+    cols = []
+    rows = []
+    cursor = 0
+    height = 0
+
+    for i, ch in enumerate(text):
+        glyph = glyphs.get(ch)
+        if glyph is None:
+            raise ValueError(f"Unsupported character: {ch!r}")
+        if i:
+            cursor += spacing
+        cols.append(glyph.cols + cursor)
+        rows.append(glyph.rows)
+        cursor += glyph.width
+        height = max(height, glyph.height)
+
+    if not cols:
+        return TextLayout(0, 0, _frozen([]), _frozen([]))
+
+    return TextLayout(
+        cursor,
+        height,
+        _frozen(np.concatenate(cols)),
+        _frozen(np.concatenate(rows)),
+    )
+
+
+def rasterize(ctx, layout, left_stud_x, top_stud_z, color=15, part_id=PLATE_1x1):
+    """
+    Place one plate per filled pixel of `layout`.
+
+    Plates sit exactly on top of the baseplate surface.
+    Returns a PlacementBuffer.
+    """
+
+    coords = np.empty((len(layout.cols), 3), dtype=np.float64)
+    coords[:, 0] = ctx.studs(left_stud_x + layout.cols)
+    coords[:, 1] = ctx.baseplate_top_origin_y
+    coords[:, 2] = ctx.studs(top_stud_z - layout.rows)
+
+    placements = PlacementBuffer()
+    placements.add_array(color, coords, IDENTITY, part_id)
+    return ctx.apply(placements)
+
+
+@lru_cache(maxsize=4096)
+def _merged_runs(layout):
+    """Greedy 1xN runs of a layout, grouped by (length, vertical)."""
+
+    groups = {}
+    for row, col, length, vertical in greedy_runs(layout.mask()):
+        rows, cols = groups.setdefault((length, vertical), ([], []))
+        rows.append(row)
+        cols.append(col)
+
+    return {
+        key: (_frozen(rows), _frozen(cols)) for key, (rows, cols) in groups.items()
+    }
+
+
+def rasterize_merged(ctx, layout, left_stud_x, top_stud_z, color=15):
+    """
+    Like `rasterize`, but merges runs of filled pixels into 1xN plates.
+
+    Horizontal runs use `PLATES[1][n]` as-is (like `build_plate`), vertical
+    runs are rotated 90 degrees around Y (like `build_plate_rotated`).
+    LDraw coordinates represent the CENTER of each plate.
+    """
+
+    placements = PlacementBuffer()
+
+    for (length, vertical), (rows, cols) in _merged_runs(layout).items():
+
+        half = (length - 1) / 2
+        coords = np.empty((len(rows), 3), dtype=np.float64)
+        coords[:, 1] = ctx.baseplate_top_origin_y
+
+        if vertical:
+            coords[:, 0] = ctx.studs(left_stud_x + cols)
+            coords[:, 2] = ctx.studs(top_stud_z - rows - half)
+            matrix = ROTATE_Y_90
+        else:
+            coords[:, 0] = ctx.studs(left_stud_x + cols + half)
+            coords[:, 2] = ctx.studs(top_stud_z - rows)
+            matrix = IDENTITY
+
+        placements.add_array(color, coords, matrix, PLATES[1][length])
+
+    return ctx.apply(placements)
@@ -1,9 +1,31 @@
+from operator import attrgetter
 from pathlib import Path
 
+import numpy as np
+
+from ldraw import iter_ldraw_lines
+
 
 class LDrawType1:
     """Minimal representation of an LDraw type-1 line."""
 
+    __slots__ = (
+        "color",
+        "x",
+        "y",
+        "z",
+        "a",
+        "b",
+        "c",
+        "d",
+        "e",
+        "f",
+        "g",
+        "h",
+        "i",
+        "part_id",
+    )
+
     def __init__(self, color, x, y, z, a, b, c, d, e, f, g, h, i, part_id):
         self.color = int(color)
         self.x = float(x)
@@ -52,11 +74,16 @@ class LDrawType1:
 
 
 def load_template(path):
-    """Load a template .ldr file containing ONLY the minifig type-1 lines."""
+    """
+    Load a template .ldr file containing ONLY the minifig type-1 lines.
+
+    Lines are read lazily from a memory-mapped file (see
+    `ldraw.iter_ldraw_lines`).
+    """
 
     path = Path(path)
     items = []
-    for raw in path.read_text(encoding="utf-8").splitlines():
+    for raw in iter_ldraw_lines(path):
         raw = raw.strip()
         if not raw or raw.startswith("0"):
             continue
@@ -68,6 +95,42 @@ def load_template(path):
     return items
 
 
+def normalize_template_arrays(positions, matrices, epsilon=1e-5):
+    """
+    Vectorized template normalization.
+
+    Parameters
+    ----------
+    positions : array_like
+        (N, 3) x, y, z per part.
+    matrices : array_like
+        (N, 9) orientation matrix (a..i) per part.
+    epsilon : float
+        Threshold used to clean near-zero / near-one matrix values
+
+    Returns
+    -------
+    (positions, matrices)
+        New arrays: positions recentered in X/Z and rounded to integer LDU
+        (round half to even, like `round`), matrix values within `epsilon`
+        of 0, 1 or -1 snapped to that value.
+    """
+
+    positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+    matrices = np.array(matrices, dtype=np.float64).reshape(-1, 9)
+
+    if len(positions):
+        center = positions.mean(axis=0)
+        center[1] = 0.0  # X/Z only
+        positions = np.round(positions - center)
+
+    for target in (0.0, 1.0, -1.0):
+        matrices[np.abs(matrices - target) < epsilon] = target
+
+    # Fold -0.0 into 0.0
+    return positions + 0.0, matrices + 0.0
+
+
 def normalize_template_inplace(parts, epsilon=1e-5):
     """
     Normalize a Studio-exported LDraw template in place.
@@ -80,6 +143,8 @@ def normalize_template_inplace(parts, epsilon=1e-5):
     - Cleans floating-point noise in rotation matrices
     - Preserves real rotations (arms, head tilt, etc.)
 
+    The arithmetic runs on NumPy arrays (see `normalize_template_arrays`).
+
     Parameters
     ----------
     parts : iterable
@@ -93,35 +158,23 @@ def normalize_template_inplace(parts, epsilon=1e-5):
     if not parts:
         return
 
-    # --- 1️⃣ Compute geometric center in X/Z ---
-    cx = sum(p.x for p in parts) / len(parts)
-    cz = sum(p.z for p in parts) / len(parts)
-
-    # --- 2️⃣ Apply normalization ---
-    for p in parts:
-
-        # Recenter (X/Z only)
-        p.x = round(p.x - cx)
-        p.y = round(p.y)
-        p.z = round(p.z - cz)
-
-        # Matrix cleanup helper
-        def clean(v):
-            if abs(v) < epsilon:
-                return 0
-            if abs(v - 1) < epsilon:
-                return 1
-            if abs(v + 1) < epsilon:
-                return -1
-            return v
-
-        # Clean orientation matrix
-        p.a = clean(p.a)
-        p.b = clean(p.b)
-        p.c = clean(p.c)
-        p.d = clean(p.d)
-        p.e = clean(p.e)
-        p.f = clean(p.f)
-        p.g = clean(p.g)
-        p.h = clean(p.h)
-        p.i = clean(p.i)
+    count = len(parts)
+    positions, matrices = normalize_template_arrays(
+        np.column_stack(
+            [np.fromiter(map(attrgetter(n), parts), np.float64, count) for n in "xyz"]
+        ),
+        np.column_stack(
+            [
+                np.fromiter(map(attrgetter(n), parts), np.float64, count)
+                for n in "abcdefghi"
+            ]
+        ),
+        epsilon,
+    )
+
+    # Back to Python numbers one column at a time (integer LDU, as before)
+    columns = positions.astype(np.int64).T.tolist() + matrices.T.tolist()
+
+    for p, (x, y, z, a, b, c, d, e, f, g, h, i) in zip(parts, zip(*columns)):
+        p.x, p.y, p.z = x, y, z
+        p.a, p.b, p.c, p.d, p.e, p.f, p.g, p.h, p.i = a, b, c, d, e, f, g, h, i
@@ -0,0 +1,202 @@
+"""template_cache.py
+
+On-disk cache of parsed + normalized templates.
+
+`load_normalized_template` returns the same parts as
+
+    parts = load_template(path)
+    normalize_template_inplace(parts, epsilon)
+
+but stores the result in a small binary file so later runs skip both steps.
+
+Cache validity
+--------------
+One cache file per (template path, epsilon). Its header records the
+template's mtime, size and SHA-256 content hash:
+
+  - same mtime and size      -> cache used, template not read
+  - otherwise, same hash     -> cache used (header refreshed)
+  - otherwise                -> template parsed, normalized and re-cached
+
+A cache file whose payload does not match its header (truncated, garbled)
+is ignored and rebuilt from the template.
+
+Binary layout (little-endian)
+-----------------------------
+    header   magic, version, mtime_ns, size, sha256, epsilon, part count,
+             CRC-32 of the payload
+    colors   int32   x count
+    values   float64 x count x 12   (x, y, z, a..i)
+    part ids UTF-8, newline-separated
+"""
+
+import hashlib
+import os
+import struct
+import zlib
+from array import array
+from pathlib import Path
+
+from template import LDrawType1, load_template, normalize_template_inplace
+
+CACHE_MAGIC = b"BTPL"
+CACHE_VERSION = 2
+
+# magic, version, mtime_ns, size, sha256, epsilon, part count, payload CRC-32
+_HEADER = struct.Struct("<4sIqq32sdII")
+
+# x, y, z and the 9 matrix values
+_VALUES_PER_PART = 12
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def cache_path_for(template_path, cache_dir, epsilon=1e-5):
+    """Cache file used for `template_path` (one per path and epsilon)."""
+
+    key = f"{Path(template_path).resolve()}|{epsilon!r}".encode("utf-8")
+    name = hashlib.sha256(key).hexdigest()[:16]
+    return Path(cache_dir) / f"template-{name}.bin"
+
+
+def _encode(parts, stat, digest, epsilon):
+    colors = array("i", (p.color for p in parts))
+    values = array(
+        "d",
+        (
+            v
+            for p in parts
+            for v in (p.x, p.y, p.z, p.a, p.b, p.c, p.d, p.e, p.f, p.g, p.h, p.i)
+        ),
+    )
+    part_ids = "\n".join(p.part_id for p in parts).encode("utf-8")
+    payload = colors.tobytes() + values.tobytes() + part_ids
+
+    header = _HEADER.pack(
+        CACHE_MAGIC,
+        CACHE_VERSION,
+        stat.st_mtime_ns,
+        stat.st_size,
+        digest,
+        epsilon,
+        len(parts),
+        zlib.crc32(payload),
+    )
+    return header + payload
+
+
+def _read_header(data):
+    """Return (mtime_ns, size, digest, epsilon, count, crc), or None if invalid."""
+
+    if len(data) < _HEADER.size:
+        return None
+
+    magic, version, *fields = _HEADER.unpack_from(data)
+    if magic != CACHE_MAGIC or version != CACHE_VERSION:
+        return None
+    return tuple(fields)
+
+
+def _decode(data, count, crc):
+    """Parts stored in `data`, or None if the payload does not match the header."""
+
+    offset = _HEADER.size
+    if zlib.crc32(memoryview(data)[offset:]) != crc:
+        return None
+
+    colors = array("i")
+    values = array("d")
+    values_size = values.itemsize * _VALUES_PER_PART * count
+    colors_size = colors.itemsize * count
+
+    if len(data) < offset + colors_size + values_size:
+        return None
+
+    colors.frombytes(data[offset : offset + colors_size])
+    offset += colors_size
+
+    values.frombytes(data[offset : offset + values_size])
+    offset += values_size
+
+    try:
+        part_ids = data[offset:].decode("utf-8").split("\n") if count else []
+    except UnicodeDecodeError:
+        return None
+    if len(part_ids) != count:
+        return None
+
+    parts = []
+    for n, (color, part_id) in enumerate(zip(colors, part_ids)):
+        row = values[_VALUES_PER_PART * n : _VALUES_PER_PART * (n + 1)]
+        parts.append(LDrawType1(color, *row, part_id))
+    return parts
+
+
+def _write(cache_path, data):
+    """Write atomically so a concurrent build never reads a partial file."""
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, cache_path)
+
+
+def load_normalized_template(path, cache_dir, epsilon=1e-5):
+    """
+    Load and normalize a template, through the on-disk cache.
+
+    Parameters
+    ----------
+    path : str or Path
+        Template .ldr file (see `template.load_template`).
+    cache_dir : str or Path
+        Directory holding cache files; created if missing.
+    epsilon : float
+        Passed to `normalize_template_inplace`.
+    """
+
+    path = Path(path)
+    stat = path.stat()
+    cache_path = cache_path_for(path, cache_dir, epsilon)
+
+    try:
+        data = cache_path.read_bytes()
+    except FileNotFoundError:
+        data = b""
+
+    header = _read_header(data)
+    current = None
+
+    if header is not None:
+        mtime_ns, size, digest, cached_epsilon, count, crc = header
+
+        if (
+            cached_epsilon == epsilon
+            and mtime_ns == stat.st_mtime_ns
+            and size == stat.st_size
+        ):
+            parts = _decode(data, count, crc)
+            if parts is not None:
+                return parts
+
+        # Touched but maybe unchanged (checkout, copy): compare content
+        current = _file_digest(path)
+        if cached_epsilon == epsilon and digest == current:
+            parts = _decode(data, count, crc)
+            if parts is not None:
+                _write(cache_path, _encode(parts, stat, current, epsilon))
+                return parts
+
+    if current is None:
+        current = _file_digest(path)
+
+    parts = load_template(path)
+    normalize_template_inplace(parts, epsilon)
+    _write(cache_path, _encode(parts, stat, current, epsilon))
+    return parts
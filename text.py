@@ -1,3 +1,13 @@
+from functools import lru_cache
+
+from raster import (
+    PLATE_1x1,
+    compile_glyphs,
+    layout_glyphs,
+    rasterize,
+    rasterize_merged,
+)
+
 LETTERS_5x7 = {
     "A": [
         "..#..",
@@ -254,7 +264,15 @@ LETTERS_5x7 = {
 }
 
 
-PLATE_1x1 = "3024.dat"
+# Compiled once at import: filled (col, row) offsets + size per letter
+LETTER_GLYPHS = compile_glyphs(LETTERS_5x7)
+
+
+@lru_cache(maxsize=4096)
+def layout_letters(text, letter_spacing=1):
+    """Lay out an upper-case string (cached by text and spacing)."""
+
+    return layout_glyphs(LETTER_GLYPHS, text, letter_spacing)
 
 
 def build_text_from_top_left(
@@ -264,6 +282,7 @@ def build_text_from_top_left(
     start_stud_z,
     color=15,
     letter_spacing=1,
+    merge=False,
 ):
     """
     Render a single-line text starting from TOP-LEFT stud position.
@@ -274,40 +293,14 @@ def build_text_from_top_left(
         Left-most stud coordinate.
     start_stud_z : float
         TOP-most stud coordinate.
+    merge : bool
+        Merge runs of pixels into 1xN plates instead of 1x1 plates only.
     """
 
-    lines = []
-    cursor_x = start_stud_x
-
-    for char in text.upper():
-
-        if char not in LETTERS_5x7:
-            raise ValueError(f"Unsupported character: {char}")
-
-        bitmap = LETTERS_5x7[char]
-        height = len(bitmap)
-        width = len(bitmap[0])
-
-        for row_idx in range(height):
-            for col_idx in range(width):
-
-                if bitmap[row_idx][col_idx] != "#":
-                    continue
-
-                stud_x = cursor_x + col_idx
-
-                # 🔥 now writing downward
-                stud_z = start_stud_z - row_idx
-
-                x = ctx.studs(stud_x)
-                z = ctx.studs(stud_z)
-                y = ctx.baseplate_top_origin_y
-
-                lines.append(
-                    f"1 {color} {x:.6f} {y:.6f} {z:.6f} "
-                    f"1 0 0 0 1 0 0 0 1 {PLATE_1x1}"
-                )
+    layout = layout_letters(text.upper(), letter_spacing)
 
-        cursor_x += width + letter_spacing
+    # Rows are written downward from the top-left stud
+    if merge:
+        return rasterize_merged(ctx, layout, start_stud_x, start_stud_z, color)
 
-    return lines
+    return rasterize(ctx, layout, start_stud_x, start_stud_z, color, PLATE_1x1)
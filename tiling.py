@@ -0,0 +1,342 @@
+"""tiling.py
+
+Cover filled stud regions with fewer, larger parts.
+
+Pixel text is drawn with one 1x1 plate per filled pixel. Runs of filled
+pixels can be replaced by a single 1xN plate from `PLATES`, placed either
+along X (identity) or along Z (rotated 90 degrees around Y, as in
+`build_plate_rotated`).
+
+`cover_mask` generalizes this to any occupied stud mask and any catalog
+(`PLATES`, `TILES`, `BRICKS`), using 2-wide parts as well.
+
+Masks use the raster.py convention: row 0 is the TOP row, rows grow
+downward (towards smaller Z) and columns grow along +X.
+"""
+
+import numpy as np
+
+from brick import BRICK_HEIGHT, get_brick_size
+from buffer import PlacementBuffer
+from catalog import PLATES
+from context import PLATE_HEIGHT
+from placement import IDENTITY, ROTATE_Y_90
+
+# Available 1xN plate lengths, longest first
+PLATE_LENGTHS = tuple(sorted(PLATES[1], reverse=True))
+
+
+def _largest_fitting(run, lengths):
+    for length in lengths:
+        if length <= run:
+            return length
+    raise ValueError(f"No part fits a run of {run} studs")
+
+
+def greedy_runs(mask, lengths=PLATE_LENGTHS):
+    """
+    Greedily merge filled pixels into 1xN runs.
+
+    Cells are visited in row-major order. At each uncovered cell, the
+    horizontal run (to the right) and the vertical run (downward) of
+    uncovered pixels are measured; the longer one is taken and covered by
+    the largest available length that fits.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        Boolean mask (rows x columns).
+    lengths : tuple
+        Available part lengths, longest first (1 must be included).
+
+    Returns
+    -------
+    list of (row, col, length, vertical)
+        (row, col) is the top-left pixel of the run.
+    """
+
+    remaining = np.array(mask, dtype=bool)
+    height, width = remaining.shape
+    runs = []
+
+    for row, col in zip(*np.nonzero(remaining)):
+
+        if not remaining[row, col]:
+            continue
+
+        h = 1
+        while col + h < width and remaining[row, col + h]:
+            h += 1
+
+        v = 1
+        while row + v < height and remaining[row + v, col]:
+            v += 1
+
+        if v > h:
+            length = _largest_fitting(v, lengths)
+            remaining[row : row + length, col] = False
+            runs.append((int(row), int(col), length, True))
+        else:
+            length = _largest_fitting(h, lengths)
+            remaining[row, col : col + length] = False
+            runs.append((int(row), int(col), length, False))
+
+    return runs
+
+
+# ============================================================
+# RECTANGLE COVER (plates / tiles / bricks)
+# ============================================================
+
+# Regions up to this many filled studs are solved exactly
+EXACT_CELL_LIMIT = 48
+
+# Search nodes allowed to the exact solver before it settles for the best
+# cover found so far
+EXACT_NODE_LIMIT = 200_000
+
+
+class _SearchBudgetExceeded(Exception):
+    pass
+
+
+def part_shapes(catalog):
+    """
+    List the footprints available in a {width: {length: part_id}} catalog.
+
+    Each part gives one footprint per orientation:
+        (rows, cols, part_id, rotated)
+    where `rows` is the extent along Z and `cols` along X. Parts are placed
+    with their length along X unless `rotated` (90 degrees around Y).
+    Largest footprints come first.
+    """
+
+    shapes = []
+    for width, length_dict in catalog.items():
+        for length, part_id in length_dict.items():
+            shapes.append((width, length, part_id, False))
+            if width != length:
+                shapes.append((length, width, part_id, True))
+
+    shapes.sort(key=lambda s: (-s[0] * s[1], -s[1]))
+    return shapes
+
+
+def _greedy_cover(mask, shapes):
+    """
+    Largest-area-first heuristic.
+
+    For each footprint (largest first), every position where it fits inside
+    the remaining region is found at once with an integral image, then
+    positions are taken in row-major order while they are still free.
+    """
+
+    remaining = np.array(mask, dtype=bool)
+    height, width = remaining.shape
+    cover = []
+
+    for rows, cols, part_id, rotated in shapes:
+
+        if rows > height or cols > width:
+            continue
+
+        integral = np.zeros((height + 1, width + 1), dtype=np.int64)
+        integral[1:, 1:] = remaining.cumsum(axis=0).cumsum(axis=1)
+
+        window = (
+            integral[rows:, cols:]
+            - integral[:-rows, cols:]
+            - integral[rows:, :-cols]
+            + integral[:-rows, :-cols]
+        )
+
+        for r, c in np.argwhere(window == rows * cols):
+            block = remaining[r : r + rows, c : c + cols]
+            if block.all():
+                block[...] = False
+                cover.append((int(r), int(c), rows, cols, part_id, rotated))
+
+    if remaining.any():
+        raise ValueError("Region cannot be covered by the given parts")
+
+    return cover
+
+
+def _exact_cover(mask, shapes, best, node_limit):
+    """
+    Branch and bound search for a minimum-count cover.
+
+    The first uncovered cell (row-major) must be the top-left corner of
+    whichever part covers it, so only footprints anchored there are tried.
+    `best` (a valid cover) seeds the upper bound.
+    """
+
+    grid = [list(row) for row in np.asarray(mask, dtype=bool)]
+    height = len(grid)
+    width = len(grid[0]) if height else 0
+    cells = [(r, c) for r in range(height) for c in range(width) if grid[r][c]]
+    max_area = max(rows * cols for rows, cols, _, _ in shapes)
+
+    best = list(best)
+    current = []
+    nodes = 0
+
+    def fits(r, c, rows, cols):
+        if r + rows > height or c + cols > width:
+            return False
+        return all(
+            grid[rr][cc] for rr in range(r, r + rows) for cc in range(c, c + cols)
+        )
+
+    def fill(r, c, rows, cols, value):
+        for rr in range(r, r + rows):
+            for cc in range(c, c + cols):
+                grid[rr][cc] = value
+
+    def search(index, left):
+        nonlocal best, nodes
+
+        nodes += 1
+        if nodes > node_limit:
+            raise _SearchBudgetExceeded
+
+        while index < len(cells) and not grid[cells[index][0]][cells[index][1]]:
+            index += 1
+
+        if index == len(cells):
+            if len(current) < len(best):
+                best = list(current)
+            return
+
+        # Lower bound: even the largest part cannot do better than this
+        if len(current) + -(-left // max_area) >= len(best):
+            return
+
+        r, c = cells[index]
+        for rows, cols, part_id, rotated in shapes:
+            if not fits(r, c, rows, cols):
+                continue
+            fill(r, c, rows, cols, False)
+            current.append((r, c, rows, cols, part_id, rotated))
+            search(index + 1, left - rows * cols)
+            current.pop()
+            fill(r, c, rows, cols, True)
+
+    try:
+        search(0, len(cells))
+    except _SearchBudgetExceeded:
+        pass
+
+    return best
+
+
+def cover_mask(
+    mask, catalog=PLATES, exact_limit=EXACT_CELL_LIMIT, node_limit=EXACT_NODE_LIMIT
+):
+    """
+    Cover every filled cell of `mask` with parts from `catalog`.
+
+    Small regions (at most `exact_limit` filled cells) are solved with an
+    exact branch and bound search for the minimum number of parts; larger
+    ones use the largest-area-first heuristic.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        Boolean mask (rows x columns), row 0 = TOP row.
+    catalog : dict
+        `PLATES`, `TILES` or `BRICKS`.
+
+    Returns
+    -------
+    list of (row, col, rows, cols, part_id, rotated)
+        (row, col) is the top-left cell of each part's footprint.
+    """
+
+    shapes = part_shapes(catalog)
+    cover = _greedy_cover(mask, shapes)
+
+    if int(np.count_nonzero(mask)) <= exact_limit:
+        cover = _exact_cover(mask, shapes, cover, node_limit)
+
+    return cover
+
+
+def part_height(part_id):
+    """Height in LDU of a catalog part: bricks are 3 plates, plates and tiles 1."""
+
+    return BRICK_HEIGHT if get_brick_size(part_id) else PLATE_HEIGHT
+
+
+def cover_placements(
+    ctx, mask, left_stud_x, top_stud_z, color=15, catalog=PLATES, height=None
+):
+    """
+    Cover `mask` (see `cover_mask`) and return the placements.
+
+    The mask is positioned like raster.py layouts: cell (row, col) is the
+    stud (left_stud_x + col, top_stud_z - row). LDraw coordinates represent
+    the CENTER of each part, which sits on top of the baseplate: parts
+    taller than a plate are raised by their extra height.
+    Returns a PlacementBuffer.
+
+    Parameters
+    ----------
+    height : float, optional
+        Part height in LDU for every part of `catalog`; by default looked
+        up per part (`part_height`).
+    """
+
+    placements = PlacementBuffer()
+    base_y = ctx.baseplate_top_origin_y
+
+    for row, col, rows, cols, part_id, rotated in cover_mask(mask, catalog):
+        x = ctx.studs(left_stud_x + col + (cols - 1) / 2)
+        z = ctx.studs(top_stud_z - row - (rows - 1) / 2)
+        # -Y is up: lift taller parts so their bottom rests on the baseplate
+        y = base_y - ((height or part_height(part_id)) - PLATE_HEIGHT)
+        matrix = ROTATE_Y_90 if rotated else IDENTITY
+        placements.add(color, x, y, z, matrix, part_id)
+
+    return ctx.apply(placements)
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+
+def benchmark():
+    """Compare part counts and timings against the naive 1x1 fill."""
+
+    from time import perf_counter
+
+    from catalog import BRICKS, TILES
+    from digits import layout_digits
+    from text import layout_letters
+
+    rng = np.random.default_rng(0)
+    blob = rng.random((24, 24)) < 0.75
+
+    regions = {
+        "digit '8'": layout_digits("8").mask(),
+        "digits '1234567890'": layout_digits("1234567890").mask(),
+        "text 'LAURENT'": layout_letters("LAURENT").mask(),
+        "table 30x32 (filled)": np.ones((30, 32), dtype=bool),
+        "random blob 24x24": blob,
+    }
+    catalogs = {"PLATES": PLATES, "TILES": TILES, "BRICKS": BRICKS}
+
+    print(f"{'region':24} {'catalog':8} {'1x1':>6} {'cover':>6} {'ms':>9}")
+
+    for name, mask in regions.items():
+        naive = int(np.count_nonzero(mask))
+        for catalog_name, catalog in catalogs.items():
+            start = perf_counter()
+            cover = cover_mask(mask, catalog)
+            elapsed = (perf_counter() - start) * 1000
+            print(f"{name:24} {catalog_name:8} {naive:6} {len(cover):6} {elapsed:9.2f}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,274 @@
+"""venue.py
+
+Venue specification: the baseplate grid, the tables (label, position,
+seats) and the free text blocks that `main.build_scene` generates.
+
+A venue is read from a JSON file (or YAML, if PyYAML is installed):
+
+    {
+      "name": "Plateau + digits test",
+      "baseplates": {"cols": 3, "rows": 5, "color": 1},
+      "seat_layouts": {
+        "default": {"cols": 4, "rows": 3, "spacing": 8, "skip": [[1, 1], [1, 2]]}
+      },
+      "tables": [
+        {"label": "1", "x": 0, "z": 96},
+        {"grid": {"cols": 20, "rows": 50, "pitch": 32, "origin": [0, 0],
+                  "first_label": 2}}
+      ],
+      "texts": [
+        {"text": "SOPHIE", "plate_row": 0, "plate_col": 0, "center": true}
+      ]
+    }
+
+Coordinates are in studs. Table positions are group centers; seats are
+(x, z, facing) offsets from the table center, given either as a seat layout
+name, an inline grid ({"cols", "rows", "spacing", "skip", "facing"}) or a
+list of [x, z] / [x, z, facing] entries. `facing` is the guest's rotation
+about Y in degrees (0 = template orientation, head towards +Z; 90 turns +Z
+into +X, see `placement.rotation_y`). A grid's "facing" is either a number
+for every seat or "center": guests of the first and last rows face the
+table along Z, the others along X. Tables without "seats" use the "default" layout (DEFAULT_SEATS if
+the file does not define one). A {"grid": ...} entry expands to a row-major
+grid of tables numbered from "first_label", top row first.
+
+Inline layouts are shared by seat tuple: tables with the same seats use the
+same layout (and so the same group body and submodel), whether the seats
+were given inline or by name. Table labels must be unique.
+"""
+
+import json
+import math
+from dataclasses import dataclass
+from pathlib import Path
+
+DEFAULT_LAYOUT = "default"
+
+
+FACE_CENTER = "center"
+
+
+def facing_towards(dx, dz):
+    """Facing (degrees) that turns the template's +Z towards (dx, dz)."""
+
+    if not dx and not dz:
+        return 0.0
+    return math.degrees(math.atan2(dx, dz)) + 0.0
+
+
+def seat_grid(cols, rows, spacing, skip=(), facing=0):
+    """
+    Seats (x, z, facing) of a cols x rows grid centered on the table, row by row.
+
+    Parameters
+    ----------
+    skip : iterable
+        (row, col) cells left empty.
+    facing : float or "center"
+        Rotation of every guest in degrees, or FACE_CENTER: guests of the
+        first and last rows face the table along Z, the others along X.
+    """
+
+    skip = {tuple(cell) for cell in skip}
+    seats = []
+
+    for row in range(rows):
+        for col in range(cols):
+            if (row, col) in skip:
+                continue
+
+            x = (col - (cols - 1) / 2) * spacing
+            z = (row - (rows - 1) / 2) * spacing
+
+            if facing != FACE_CENTER:
+                angle = float(facing)
+            elif rows > 1 and row in (0, rows - 1):
+                angle = facing_towards(0, -z)
+            else:
+                angle = facing_towards(-x, 0)
+
+            seats.append((x, z, angle))
+
+    return tuple(seats)
+
+
+# 4x3 minifigs around the table, the two middle seats left for the digit
+DEFAULT_SEATS = seat_grid(4, 3, 8, skip=((1, 1), (1, 2)))
+
+
+@dataclass(frozen=True)
+class Table:
+    """One group: label digits + minifigs + frame, centered on (x, z)."""
+
+    label: str
+    x: float
+    z: float
+    seat_layout: str = DEFAULT_LAYOUT
+    color: int = 15
+
+
+@dataclass(frozen=True)
+class TextBlock:
+    """Free text rendered inside one baseplate (see build_text_on_baseplate)."""
+
+    text: str
+    plate_row: int
+    plate_col: int
+    center: bool = False
+    margin: int = 4
+    letter_spacing: int = 1
+    delta_x: float = 0
+    delta_z: float = 0
+    color: int = 15
+
+
+@dataclass(frozen=True)
+class Venue:
+    name: str
+    cols: int
+    rows: int
+    baseplate_color: int
+    seat_layouts: dict
+    tables: tuple
+    texts: tuple
+
+    def seats(self, table):
+        """Seat offsets of `table`."""
+
+        return self.seat_layouts[table.seat_layout]
+
+
+# ============================================================
+# PARSING
+# ============================================================
+
+
+def _parse_seats(spec):
+    if isinstance(spec, dict):
+        return seat_grid(
+            spec["cols"],
+            spec["rows"],
+            spec["spacing"],
+            spec.get("skip", ()),
+            spec.get("facing", 0),
+        )
+
+    seats = []
+    for seat in spec:
+        if len(seat) not in (2, 3):
+            raise ValueError(f"Seats are [x, z] or [x, z, facing]: {seat!r}")
+        x, z, *facing = seat
+        seats.append((float(x), float(z), float(facing[0]) if facing else 0.0))
+    return tuple(seats)
+
+
+def _expand_grid(spec):
+    """Yield table specs for a {"grid": ...} entry (top row first)."""
+
+    cols = spec["cols"]
+    rows = spec["rows"]
+    pitch_x = spec.get("pitch_x", spec.get("pitch", 32))
+    pitch_z = spec.get("pitch_z", spec.get("pitch", 32))
+    origin_x, origin_z = spec.get("origin", (0, 0))
+    label = int(spec.get("first_label", 1))
+
+    for row in range(rows):
+        for col in range(cols):
+            entry = {
+                key: spec[key] for key in ("seats", "color") if key in spec
+            }
+            entry["label"] = str(label)
+            entry["x"] = origin_x + col * pitch_x
+            entry["z"] = origin_z + (rows - 1 - row) * pitch_z
+            yield entry
+            label += 1
+
+
+def _inline_layout(seats, seat_layouts, layout_names):
+    """Name of the layout holding `seats`, registering a new one if needed."""
+
+    name = layout_names.get(seats)
+    if name is None:
+        number = 1
+        while f"inline-{number}" in seat_layouts:
+            number += 1
+        name = f"inline-{number}"
+        seat_layouts[name] = seats
+        layout_names[seats] = name
+    return name
+
+
+def parse_venue(data):
+    """Build a Venue from a parsed JSON/YAML document."""
+
+    try:
+        baseplates = data["baseplates"]
+
+        seat_layouts = {DEFAULT_LAYOUT: DEFAULT_SEATS}
+        for name, spec in data.get("seat_layouts", {}).items():
+            seat_layouts[name] = _parse_seats(spec)
+
+        # Seat tuple -> layout name, so identical inline layouts are shared
+        layout_names = {}
+        for name, seats in seat_layouts.items():
+            layout_names.setdefault(seats, name)
+
+        tables = []
+        labels = set()
+        for entry in data.get("tables", ()):
+            entries = _expand_grid(entry["grid"]) if "grid" in entry else (entry,)
+
+            for spec in entries:
+                label = str(spec["label"])
+                if label in labels:
+                    raise ValueError(f"Duplicate table label: {label!r}")
+                labels.add(label)
+
+                seats = spec.get("seats", DEFAULT_LAYOUT)
+                if not isinstance(seats, str):
+                    seats = _inline_layout(_parse_seats(seats), seat_layouts, layout_names)
+                elif seats not in seat_layouts:
+                    raise ValueError(f"Unknown seat layout: {seats!r}")
+
+                tables.append(
+                    Table(
+                        label,
+                        spec["x"],
+                        spec["z"],
+                        seats,
+                        spec.get("color", 15),
+                    )
+                )
+
+        texts = tuple(TextBlock(**spec) for spec in data.get("texts", ()))
+
+        return Venue(
+            name=data.get("name", "Untitled venue"),
+            cols=baseplates["cols"],
+            rows=baseplates["rows"],
+            baseplate_color=baseplates.get("color", 1),
+            seat_layouts=seat_layouts,
+            tables=tuple(tables),
+            texts=texts,
+        )
+
+    except (KeyError, TypeError) as exc:
+        raise ValueError(f"Invalid venue specification: {exc}") from exc
+
+
+def load_venue(path):
+    """Read a venue from a .json or .yaml / .yml file."""
+
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+
+    if path.suffix.lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as exc:
+            raise ImportError("PyYAML is required to read YAML venue files") from exc
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+
+    return parse_venue(data)